@@ -0,0 +1,204 @@
+"""
+Versioned response cache for read-mostly JSON endpoints.
+
+Every namespace ('events', 'announcements', ...) has a version stamp in the
+cache.  Rendered response bodies are stored under a key that embeds the
+current stamps of all namespaces the endpoint reads, so a write only has to
+bump a stamp (see reconnect.signals) and superseded bodies simply age out
+under the cache's TTL / culling rules.  A warm read is two cache lookups and
+never touches the ORM.
+
+A process-local (LocMem) 'api' cache cannot share stamps between workers.
+The stamps then live in ApiCacheVersion and are only held in the local cache
+for API_CACHE_STAMP_TTL seconds, so a bump on one worker reaches every other
+worker's bodies and validators within that time.
+
+``conditional`` derives ETag / Last-Modified validators from the same stamps
+so unchanged lists can be answered with a bodiless 304.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from reconnect.models import ApiCacheVersion
+
+CACHE_ALIAS = getattr(settings, 'API_CACHE_ALIAS', 'api')
+DEFAULT_TTL = 300
+STAMPS_IN_DB = settings.CACHES[CACHE_ALIAS]['BACKEND'].endswith('.LocMemCache')
+STAMP_TTL = getattr(settings, 'API_CACHE_STAMP_TTL', 1) if STAMPS_IN_DB else None
+
+_namespaces = set()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _now_stamp():
+    return time.time_ns() // 1000
+
+
+def _stored_versions(namespaces):
+    """Stamps from ApiCacheVersion, seeding missing ones."""
+    stored = dict(ApiCacheVersion.objects.filter(namespace__in=namespaces).values_list('namespace', 'stamp'))
+    missing = [ns for ns in namespaces if ns not in stored]
+    if missing:
+        ApiCacheVersion.objects.bulk_create(
+            [ApiCacheVersion(namespace=ns, stamp=_now_stamp()) for ns in missing], ignore_conflicts=True,
+        )
+        stored.update(ApiCacheVersion.objects.filter(namespace__in=missing).values_list('namespace', 'stamp'))
+    return stored
+
+
+def get_versions(namespaces):
+    """Current version stamp of each namespace, seeding missing ones."""
+    cache = _cache()
+    keys = {ns: f'apiver:{ns}' for ns in namespaces}
+    found = cache.get_many(keys.values())
+    versions = {ns: found[key] for ns, key in keys.items() if key in found}
+    missing = [ns for ns in namespaces if ns not in versions]
+    if not missing:
+        return versions
+    if STAMPS_IN_DB:
+        stored = _stored_versions(missing)
+        cache.set_many({keys[ns]: stored[ns] for ns in missing}, timeout=STAMP_TTL)
+        versions.update(stored)
+    else:
+        for ns in missing:
+            # Seed from the clock so a cold cache never reissues an old stamp.
+            cache.add(keys[ns], _now_stamp(), timeout=None)
+            versions[ns] = cache.get(keys[ns])
+    return versions
+
+
+def bump(namespace):
+    """Invalidate every cached response that depends on ``namespace``."""
+    stamp = _now_stamp()
+    if STAMPS_IN_DB:
+        ApiCacheVersion.objects.update_or_create(namespace=namespace, defaults={'stamp': stamp})
+    _cache().set(f'apiver:{namespace}', stamp, timeout=STAMP_TTL)
+
+
+def _record(namespace, outcome):
+    cache = _cache()
+    key = f'apistats:{namespace}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def stats():
+    """Hit / miss counters per cached namespace."""
+    cache = _cache()
+    result = {}
+    for ns in sorted(_namespaces):
+        counts = cache.get_many([f'apistats:{ns}:hits', f'apistats:{ns}:misses'])
+        result[ns] = {
+            'hits': counts.get(f'apistats:{ns}:hits', 0),
+            'misses': counts.get(f'apistats:{ns}:misses', 0),
+        }
+    return result
+
+
+def cached_response(namespace, depends_on=()):
+    """
+    Cache a view's 200 JSON body under ``namespace``.  ``depends_on`` lists
+    other namespaces whose writes must also invalidate it.  The TTL comes from
+    ``settings.API_CACHE_TTLS[namespace]``.
+    """
+    namespaces = (namespace, *depends_on)
+    ttl = getattr(settings, 'API_CACHE_TTLS', {}).get(namespace, DEFAULT_TTL)
+    _namespaces.add(namespace)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            versions = get_versions(namespaces)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            stamp = '.'.join(str(versions[ns]) for ns in namespaces)
+            key = f'apiresp:{namespace}:{stamp}:{path}'
+
+            cache = _cache()
+            body = cache.get(key)
+            if body is not None:
+                _record(namespace, 'hits')
+                return HttpResponse(body, content_type='application/json')
+
+            _record(namespace, 'misses')
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.content, ttl)
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional(namespace, depends_on=(), sources=()):
+    """
+    Answer conditional GETs with ``304 Not Modified``.
+
+    The strong ETag hashes the request path, the namespaces' version stamps
+    and the ``(count, max created_at)`` of each queryset in ``sources``;
+    Last-Modified is the newest of those stamps and timestamps.  Neither needs
+    the response body to be rendered.  The source aggregates are cached under
+    the current stamps (a write bumps them anyway), so a warm request never
+    touches the ORM.
+    """
+    namespaces = (namespace, *depends_on)
+    ttl = getattr(settings, 'API_CACHE_TTLS', {}).get(namespace, DEFAULT_TTL)
+
+    def source_validators(versions):
+        stamp = '.'.join(str(versions[ns]) for ns in namespaces)
+        key = f'apivalid:{namespace}:{stamp}'
+        cache = _cache()
+        found = cache.get(key)
+        if found is None:
+            parts, newest = [], None
+            for qs in sources:
+                agg = qs.aggregate(n=Count('id'), newest=Max('created_at'))
+                parts.append(f"{agg['n']}@{agg['newest'].isoformat() if agg['newest'] else ''}")
+                if agg['newest'] and (newest is None or agg['newest'] > newest):
+                    newest = agg['newest']
+            found = (parts, newest)
+            cache.set(key, found, ttl)
+        return found
+
+    def compute(request):
+        cached = getattr(request, '_api_validators', None)
+        if cached is not None:
+            return cached
+        versions = get_versions(namespaces)
+        parts = [request.get_full_path()] + [f'{ns}={versions[ns]}' for ns in namespaces]
+        latest = datetime.fromtimestamp(max(versions.values()) / 1e6, tz=timezone.utc)
+        source_parts, newest = source_validators(versions)
+        parts += source_parts
+        if newest and newest > latest:
+            latest = newest
+        etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+        request._api_validators = (f'"{etag}"', latest)
+        return request._api_validators
+
+    def decorator(view_func):
+        conditional_view = condition(
+            etag_func=lambda request, *args, **kwargs: compute(request)[0],
+            last_modified_func=lambda request, *args, **kwargs: compute(request)[1],
+        )(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Let browsers keep the body but revalidate it on every fetch().
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class ReconnectConfig(AppConfig):
+    name = 'reconnect'
+
+    def ready(self):
+        from reconnect import signals  # noqa: F401 — registers model signal handlers
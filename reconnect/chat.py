@@ -0,0 +1,484 @@
+"""
+Chat write paths shared by ChatConsumer and the HTTP chat views.
+
+With ``settings.CHAT_WRITE_BEHIND`` on, ChatConsumer does not write a row per
+frame.  The message gets its (time-ordered) id up front, is broadcast at
+once and then queued in a per-process ``MessageBuffer``, which persists
+queued messages with one ``bulk_create`` once ``CHAT_FLUSH_BATCH`` are
+pending or ``CHAT_FLUSH_INTERVAL`` seconds after the first one, and sends
+each sender a ``chat.ack`` for the ids that were committed.
+
+Every message -- socket frame or HTTP fallback -- goes through
+``dispatch_message``, which persists it, rolls it into the conversation's
+inbox fields and publishes it to the room group.  Publishes issued in the
+same event-loop tick are coalesced into one ``chat.messages`` group send per
+room.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+import uuid
+import weakref
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from reconnect.models import Conversation, ConversationParticipant, CustomUser, Message
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_CHARS = 100
+HISTORY_PAGE_SIZE = 50
+
+WRITE_BEHIND = getattr(settings, 'CHAT_WRITE_BEHIND', False)
+FLUSH_INTERVAL = getattr(settings, 'CHAT_FLUSH_INTERVAL', 0.5)
+FLUSH_BATCH = getattr(settings, 'CHAT_FLUSH_BATCH', 200)
+READ_COALESCE_WINDOW = getattr(settings, 'CHAT_READ_COALESCE_WINDOW', 2.0)
+RESUME_MAX_MESSAGES = getattr(settings, 'CHAT_RESUME_MAX_MESSAGES', 200)
+
+MEMBERSHIP_TTL = getattr(settings, 'CHAT_MEMBERSHIP_TTL', 5)
+MEMBERSHIP_NEGATIVE_TTL = getattr(settings, 'CHAT_MEMBERSHIP_NEGATIVE_TTL', 5)
+
+# A process-local cache only ever hears about removals made in this process,
+# so a cached "yes" must run out quickly: until it does, a removed member
+# keeps access on every other worker.
+LOCAL_CACHE_MAX_TTL = 5
+if settings.CACHES['default']['BACKEND'].endswith('.LocMemCache'):
+    MEMBERSHIP_TTL = min(MEMBERSHIP_TTL, LOCAL_CACHE_MAX_TTL)
+    MEMBERSHIP_NEGATIVE_TTL = min(MEMBERSHIP_NEGATIVE_TTL, LOCAL_CACHE_MAX_TTL)
+
+
+# ─── Membership ──────────────────────────────────────────────────────────────
+
+def _membership_key(conversation_id, user_id):
+    return f'convmember:{conversation_id}:{user_id}'
+
+
+def is_participant(conversation_id, user_id):
+    """
+    Whether ``user_id`` belongs to the conversation.  Answers (yes and no)
+    are kept in the default cache and dropped by reconnect.signals whenever
+    a ConversationParticipant row is saved or deleted, so a warm check costs
+    no query.  Signals only reach the cache of the process that made the
+    change, so long TTLs are only safe with a shared cache backend.
+    """
+    try:
+        conversation_id = uuid.UUID(str(conversation_id))
+    except ValueError:
+        return False
+    key = _membership_key(conversation_id, user_id)
+    member = cache.get(key)
+    if member is None:
+        member = ConversationParticipant.objects.filter(
+            conversation_id=conversation_id, user_id=user_id,
+        ).exists()
+        cache.set(key, member, MEMBERSHIP_TTL if member else MEMBERSHIP_NEGATIVE_TTL)
+    return member
+
+
+def forget_membership(conversation_id, user_id):
+    cache.delete(_membership_key(conversation_id, user_id))
+
+
+def prime_memberships(conversation_id, user_ids):
+    """
+    Cache ``user_ids`` as members once the transaction commits.  bulk_create
+    sends no post_save, so this also replaces any stale negative answer.
+    """
+    entries = {_membership_key(conversation_id, user_id): True for user_id in user_ids}
+    transaction.on_commit(lambda: cache.set_many(entries, MEMBERSHIP_TTL))
+
+
+# ─── Conversations ───────────────────────────────────────────────────────────
+
+def add_participants(conversation, user_ids):
+    """Add ``user_ids`` with one INSERT; existing members are skipped."""
+    ConversationParticipant.objects.bulk_create(
+        [ConversationParticipant(conversation=conversation, user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+    prime_memberships(conversation.id, user_ids)
+
+
+def get_or_create_direct(user_id, other_id):
+    """
+    Return ``(conversation, created)`` for the 1-on-1 chat between two users.
+    The lookup is one probe of the unique ``direct_key`` index; if two
+    requests race to create the chat, the loser's insert fails on that index
+    and it returns the winner's conversation.
+    """
+    key = Conversation.pair_key(user_id, other_id)
+    existing = Conversation.objects.filter(direct_key=key).first()
+    if existing is not None:
+        return existing, False
+    try:
+        with transaction.atomic():
+            convo = Conversation.objects.create(is_group=False, direct_key=key, created_by_id=user_id)
+            add_participants(convo, [user_id, other_id])
+    except IntegrityError:
+        return Conversation.objects.get(direct_key=key), False
+    return convo, True
+
+
+# ─── Inbox notifications ─────────────────────────────────────────────────────
+
+def canonical_id(conversation_id):
+    """
+    ``conversation_id`` as ``str(UUID)`` -- lowercase and hyphenated, the
+    form room groups and subscriptions are keyed by -- or None if it is not
+    a UUID.  Call it where an id comes in from a URL or a client frame.
+    """
+    try:
+        return str(uuid.UUID(str(conversation_id)))
+    except ValueError:
+        return None
+
+
+def room_group(conversation_id):
+    """Channel-layer group of every socket subscribed to a conversation."""
+    return f'chat_{conversation_id}'
+
+
+def user_group(user_id):
+    """Channel-layer group every InboxConsumer of ``user_id`` joins."""
+    return f'user_{user_id}'
+
+
+def _announce(conversation_id, user_ids):
+    send = async_to_sync(get_channel_layer().group_send)
+    for user_id in user_ids:
+        try:
+            send(user_group(user_id), {'type': 'conversation.added', 'conversation_id': str(conversation_id)})
+        except Exception:
+            # Best-effort; clients also pick new chats up from conversation_list.
+            logger.exception('Could not announce conversation %s', conversation_id)
+
+
+def conversation_added(conversation_id, user_ids):
+    """Tell the participants' open inbox sockets to subscribe, once committed."""
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: _announce(conversation_id, user_ids))
+
+
+# ─── Messages ────────────────────────────────────────────────────────────────
+
+
+def touch_conversation(message):
+    """Roll ``message`` into its conversation's denormalized inbox fields."""
+    newer = Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.timestamp)
+    Conversation.objects.filter(newer, id=message.conversation_id).update(
+        last_message_at=message.timestamp,
+        last_message_preview=message.content[:PREVIEW_CHARS],
+        last_sender_id=message.sender_id,
+    )
+    ConversationParticipant.objects.filter(newer, conversation_id=message.conversation_id).update(
+        last_message_at=message.timestamp,
+    )
+
+
+def record_message(conversation_id, sender, content):
+    """Persist a message and update the conversation's inbox fields atomically."""
+    with transaction.atomic():
+        message = Message.objects.create(conversation_id=conversation_id, sender=sender, content=content)
+        touch_conversation(message)
+    return message
+
+
+def message_event(message):
+    """Channel-layer event broadcasting ``message`` (sender must be loaded)."""
+    sender = message.sender
+    return {
+        'type': 'chat_message',
+        'conversation_id': str(message.conversation_id),
+        'message': message.content,
+        'sender_id': sender.id,
+        'sender_name': sender.get_full_name() or sender.username,
+        'sender_initials': sender.get_initials(),
+        'message_id': str(message.id),
+        'timestamp': message.timestamp.strftime('%H:%M'),
+    }
+
+
+def missed_messages(conversation_id, after):
+    """
+    Messages newer than ``after`` for a reconnecting socket, oldest first, or
+    ``None`` if there are more than RESUME_MAX_MESSAGES (or ``after`` is not
+    a message id) and the client should refetch history instead.
+    """
+    try:
+        after = uuid.UUID(str(after))
+    except ValueError:
+        return None
+    rows, _, has_more = message_window(conversation_id, after=after, limit=RESUME_MAX_MESSAGES)
+    return None if has_more else rows
+
+
+def message_window(conversation_id, before=None, after=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Return ``(messages, has_more_before, has_more_after)`` for one page of
+    history in chronological order: the newest page by default, or the page
+    just before / after the message with id ``before`` / ``after``.  Message
+    ids are time-ordered, so a cursor is the id itself and every page is a
+    single range scan on (conversation, id).
+    """
+    qs = Message.objects.filter(conversation_id=conversation_id).select_related('sender')
+
+    if after:
+        rows = list(qs.filter(id__gt=after).order_by('id')[:limit + 1])
+        if len(rows) <= limit:
+            # Tail of the history: include messages still waiting to be flushed
+            rows += buffer.pending(conversation_id, after=uuid.UUID(str(after)), exclude=rows)
+        return rows[:limit], True, len(rows) > limit
+
+    if before:
+        rows = list(qs.filter(id__lt=before).order_by('-id')[:limit + 1])
+        return rows[:limit][::-1], len(rows) > limit, True
+
+    rows = list(qs.order_by('-id')[:limit + 1])
+    has_more_before = len(rows) > limit
+    rows = rows[:limit][::-1] + buffer.pending(conversation_id, exclude=rows)
+    if len(rows) > limit:
+        rows, has_more_before = rows[-limit:], True
+    return rows, has_more_before, False
+
+
+# ─── Dispatch ────────────────────────────────────────────────────────────────
+
+class Publisher:
+    """
+    Coalesces chat broadcasts per event loop.  The first publish in a tick
+    schedules a flush for the next one; everything queued by then goes out
+    as a single group send per room (a plain ``chat_message`` when there is
+    only one), so a burst across many sockets costs one layer round-trip
+    per room instead of one per message.
+    """
+
+    def __init__(self):
+        # loop -> ({group: [event]}, future resolved once they are sent)
+        self._ticks = weakref.WeakKeyDictionary()
+
+    async def publish(self, group, event):
+        loop = asyncio.get_running_loop()
+        tick = self._ticks.get(loop)
+        if tick is None:
+            tick = self._ticks[loop] = (defaultdict(list), loop.create_future())
+            loop.call_soon(lambda: asyncio.ensure_future(self._flush(loop)))
+        tick[0][group].append(event)
+        await asyncio.shield(tick[1])
+
+    async def _flush(self, loop):
+        groups, done = self._ticks.pop(loop)
+        layer = get_channel_layer()
+        try:
+            await asyncio.gather(*(
+                layer.group_send(group, events[0] if len(events) == 1 else {
+                    'type': 'chat.messages', 'messages': events,
+                })
+                for group, events in groups.items()
+            ))
+        except Exception as exc:
+            done.set_exception(exc)
+        else:
+            done.set_result(None)
+
+
+publisher = Publisher()
+
+
+async def dispatch_message(conversation_id, sender, content, reply_channel=None):
+    """
+    The one way a chat message enters the system: persist it, update the
+    conversation's inbox fields and broadcast it to the room.
+
+    Socket senders (``reply_channel`` set) go through the write-behind
+    buffer when CHAT_WRITE_BEHIND is on and are acked once it commits; HTTP
+    senders have no socket to ack, so their row is committed before this
+    returns.
+    """
+    conversation_id = canonical_id(conversation_id)
+    if WRITE_BEHIND and reply_channel:
+        message = Message(conversation_id=conversation_id, sender=sender, content=content)
+        buffer.add(message, reply_channel)
+    else:
+        message = await database_sync_to_async(record_message)(conversation_id, sender, content)
+    await publisher.publish(room_group(conversation_id), message_event(message))
+    return message
+
+
+def send_message(conversation_id, sender, content):
+    """Synchronous ``dispatch_message`` for views."""
+    return async_to_sync(dispatch_message)(conversation_id, sender, content)
+
+
+# ─── Read state ──────────────────────────────────────────────────────────────
+
+def has_message(conversation_id, message_id):
+    """
+    Whether ``message_id`` is a message of ``conversation_id``.  A message
+    still queued for write-behind is flushed first, so it can be pointed at.
+    """
+    if WRITE_BEHIND and any(m.id == message_id for m in buffer.pending(conversation_id)):
+        buffer.flush()
+    return Message.objects.filter(id=message_id, conversation_id=conversation_id).exists()
+
+
+def mark_read(conversation_id, user_id, message_id):
+    """
+    Move ``user_id``'s read pointer forward to ``message_id``.  Ids are
+    time-ordered, so an older id (a late or replayed frame) is a no-op, and
+    so is an id from another conversation.  Returns whether the pointer moved.
+    """
+    if not has_message(conversation_id, message_id):
+        return False
+    behind = Q(last_read_message__isnull=True) | Q(last_read_message__lt=message_id)
+    return bool(ConversationParticipant.objects.filter(
+        behind, conversation_id=conversation_id, user_id=user_id,
+    ).update(last_read_message_id=message_id, last_read_at=timezone.now()))
+
+
+def unread_counts(user_id):
+    """``{conversation_id: n}`` of other people's messages past ``user_id``'s read pointers."""
+    rows = Message.objects.filter(
+        Q(conversation__membership__last_read_message__isnull=True)
+        | Q(id__gt=F('conversation__membership__last_read_message')),
+        conversation__membership__user_id=user_id,
+    ).exclude(sender_id=user_id).values('conversation_id').annotate(n=Count('id')).order_by()
+    return {row['conversation_id']: row['n'] for row in rows}
+
+
+# ─── Write-behind ────────────────────────────────────────────────────────────
+
+class MessageBuffer:
+    def __init__(self, flush_interval=FLUSH_INTERVAL, flush_batch=FLUSH_BATCH):
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        # [(message, reply_channel)] in arrival order
+        self._pending = []
+        self._inflight = []
+
+    def add(self, message, reply_channel=None):
+        """
+        Queue an unsaved ``message``; ``reply_channel`` is acked once it is
+        committed.  Never touches the database, so it is safe to call from
+        the event loop -- a full buffer is flushed on a timer thread.
+        """
+        with self._lock:
+            self._pending.append((message, reply_channel))
+            if len(self._pending) >= self.flush_batch:
+                if self._timer is not None:
+                    self._timer.cancel()
+                delay = 0
+            elif self._timer is None:
+                delay = self.flush_interval
+            else:
+                return
+            self._timer = threading.Timer(delay, self._flush_on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def pending(self, conversation_id, after=None, exclude=()):
+        """Unflushed messages of one conversation, oldest first."""
+        seen = {m.id for m in exclude}
+        with self._lock:
+            queued = [m for m, _ in self._inflight + self._pending
+                      if str(m.conversation_id) == str(conversation_id)
+                      and m.id not in seen and (after is None or m.id > after)]
+        return sorted(queued, key=lambda m: m.id)
+
+    def flush(self):
+        """Persist every queued message.  Returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                batch, self._pending = self._pending, []
+                self._inflight = batch
+            if not batch:
+                return 0
+
+            try:
+                batch = self._apply(batch)
+            except Exception:
+                logger.exception('Message flush failed; re-queueing %d message(s)', len(batch))
+                with self._lock:
+                    self._pending = batch + self._pending
+                    # Retry on our own rather than waiting for the next add()
+                    if self._timer is None:
+                        self._timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+                        self._timer.daemon = True
+                        self._timer.start()
+                raise
+            finally:
+                with self._lock:
+                    self._inflight = []
+            self._ack(batch)
+            return len(batch)
+
+    def _apply(self, batch):
+        """
+        Write ``batch`` and return the entries that were written.  Messages
+        whose conversation or sender has been deleted since they were queued
+        are logged and dropped, so one of them cannot wedge the buffer.
+        """
+        conversations = set(Conversation.objects.filter(
+            id__in={message.conversation_id for message, _ in batch},
+        ).values_list('id', flat=True))
+        senders = set(CustomUser.objects.filter(
+            id__in={message.sender_id for message, _ in batch},
+        ).values_list('id', flat=True))
+        kept = [(message, reply_channel) for message, reply_channel in batch
+                if uuid.UUID(str(message.conversation_id)) in conversations and message.sender_id in senders]
+        if len(kept) < len(batch):
+            logger.warning('Dropping %d queued message(s) whose conversation or sender no longer exists',
+                           len(batch) - len(kept))
+        if kept:
+            self._write([message for message, _ in kept])
+        return kept
+
+    def _write(self, messages):
+        latest = {}
+        for message in messages:
+            current = latest.get(message.conversation_id)
+            if current is None or message.id > current.id:
+                latest[message.conversation_id] = message
+        with transaction.atomic():
+            Message.objects.bulk_create(messages, batch_size=500)
+            for message in latest.values():
+                touch_conversation(message)
+
+    def _ack(self, batch):
+        acks = defaultdict(list)
+        for message, reply_channel in batch:
+            if reply_channel:
+                acks[reply_channel].append(str(message.id))
+        layer = get_channel_layer()
+        for reply_channel, message_ids in acks.items():
+            try:
+                async_to_sync(layer.send)(reply_channel, {'type': 'chat.ack', 'message_ids': message_ids})
+            except Exception:
+                # The rows are committed either way; the socket may be gone.
+                logger.debug('Could not ack %d message(s) on %s', len(message_ids), reply_channel)
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            pass  # already logged; retried on the next flush
+        finally:
+            connection.close()
+
+
+buffer = MessageBuffer()
+atexit.register(buffer.flush)
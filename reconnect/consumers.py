@@ -1,18 +1,164 @@
+import asyncio
 import json
+import uuid
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from reconnect.models import Conversation, Message, ConversationParticipant
+from reconnect import chat, presence
+from reconnect.live_feed import FEED_GROUP
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ConversationSocket(AsyncWebsocketConsumer):
+    """
+    Chat behaviour shared by ChatConsumer and InboxConsumer: posting
+    messages, relaying group broadcasts and acks, presence, typing
+    indicators and coalesced read pointers.  Every outgoing chat frame
+    names its conversation.
+    """
+
+    async def setup_chat(self):
+        self.read_upto = {}
+        self.read_task = None
+        await presence.connected(self.user.id)
+        self.presence_task = asyncio.ensure_future(self.keep_present())
+
+    async def teardown_chat(self):
+        if getattr(self, 'presence_task', None):
+            self.presence_task.cancel()
+            await presence.disconnected(self.user.id)
+        if getattr(self, 'read_task', None):
+            self.read_task.cancel()
+            await self.flush_reads()
+        if chat.WRITE_BEHIND:
+            # Don't leave this socket's messages sitting in memory
+            try:
+                await database_sync_to_async(chat.buffer.flush)()
+            except Exception:
+                pass  # logged by the buffer; retried on the next flush
+
+    async def post_message(self, conversation_id, content):
+        content = (content or '').strip()
+        if not content:
+            return
+        # Re-checked per message: membership may have been revoked since connect
+        if not await self.check_participant(conversation_id):
+            await self.send(text_data=json.dumps({
+                'type': 'error', 'conversation_id': str(conversation_id), 'error': 'Not a participant',
+            }))
+            return
+        await chat.dispatch_message(conversation_id, self.user, content, reply_channel=self.channel_name)
+
+    async def replay(self, conversation_id, after):
+        """
+        Send what a reconnecting client missed since message ``after``.  The
+        socket has already joined the group, so nothing falls in between;
+        clients drop duplicates by message_id.
+        """
+        missed = await database_sync_to_async(chat.missed_messages)(conversation_id, after)
+        if missed is None:
+            # Too far behind: cheaper for the client to reload history
+            await self.send(text_data=json.dumps({'type': 'resync', 'conversation_id': str(conversation_id)}))
+            return
+        for msg in missed:
+            await self.chat_message(chat.message_event(msg))
+
+    async def chat_message(self, event):
+        """Handler for messages broadcast to the group."""
+        await self.send(text_data=json.dumps({
+            'type': 'chat_message',
+            'conversation_id': event['conversation_id'],
+            'message': event['message'],
+            'sender_id': event['sender_id'],
+            'sender_name': event['sender_name'],
+            'sender_initials': event['sender_initials'],
+            'message_id': event['message_id'],
+            'timestamp': event['timestamp'],
+        }))
+
+    async def chat_messages(self, event):
+        """Handler for several messages published to the group in one tick."""
+        for message in event['messages']:
+            await self.chat_message(message)
+
+    async def chat_ack(self, event):
+        """Handler for write-behind commits of this socket's messages."""
+        await self.send(text_data=json.dumps({
+            'type': 'ack',
+            'message_ids': event['message_ids'],
+        }))
+
+    # ─── Presence & typing ────────────────────────────────────────────────
+
+    async def keep_present(self):
+        while True:
+            await asyncio.sleep(presence.HEARTBEAT_INTERVAL)
+            await presence.heartbeat(self.user.id)
+
+    async def typing(self, conversation_id):
+        # At most one broadcast per user per room every TYPING_INTERVAL
+        if await presence.claim_typing(conversation_id, self.user.id):
+            await self.channel_layer.group_send(chat.room_group(conversation_id), {
+                'type': 'chat.typing',
+                'conversation_id': str(conversation_id),
+                'user_id': self.user.id,
+                'sender_name': self.user.get_full_name() or self.user.username,
+            })
+
+    async def chat_typing(self, event):
+        """Handler for typing indicators broadcast to the group."""
+        if event['user_id'] == self.user.id:
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'typing',
+            'conversation_id': event['conversation_id'],
+            'user_id': event['user_id'],
+            'sender_name': event['sender_name'],
+        }))
+
+    # ─── Read pointers ────────────────────────────────────────────────────
+
+    def note_read(self, conversation_id, message_id):
+        """
+        Remember the newest message the client says it has seen.  Written at
+        most once per CHAT_READ_COALESCE_WINDOW, however fast it scrolls.
+        """
+        try:
+            message_id = uuid.UUID(str(message_id))
+        except ValueError:
+            return
+        current = self.read_upto.get(conversation_id)
+        if current is None or message_id > current:
+            self.read_upto[conversation_id] = message_id
+        if self.read_task is None:
+            self.read_task = asyncio.ensure_future(self.flush_reads_later())
+
+    async def flush_reads_later(self):
+        await asyncio.sleep(chat.READ_COALESCE_WINDOW)
+        self.read_task = None
+        await self.flush_reads()
+
+    async def flush_reads(self):
+        pending, self.read_upto = self.read_upto, {}
+        for conversation_id, message_id in pending.items():
+            await database_sync_to_async(chat.mark_read)(conversation_id, self.user.id, message_id)
+
+    # ─── Database helpers ─────────────────────────────────────────────────
+
+    @database_sync_to_async
+    def check_participant(self, conversation_id):
+        return chat.is_participant(conversation_id, self.user.id)
+
+
+class ChatConsumer(ConversationSocket):
     """
     WebSocket consumer for real-time synchronised chat.
     URL: ws/chat/<conversation_id>/
     """
 
     async def connect(self):
-        self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
-        self.room_group_name = f'chat_{self.conversation_id}'
+        conversation_id = self.scope['url_route']['kwargs']['conversation_id']
+        self.conversation_id = chat.canonical_id(conversation_id) or conversation_id
+        self.room_group_name = chat.room_group(self.conversation_id)
         self.user = self.scope['user']
 
         # Reject anonymous users
@@ -21,11 +167,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return
 
         # Verify user is a participant
-        is_participant = await self.check_participant()
+        is_participant = await self.check_participant(self.conversation_id)
         if not is_participant:
             await self.close()
             return
 
+        await self.setup_chat()
+
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
@@ -33,61 +181,146 @@ class ChatConsumer(AsyncWebsocketConsumer):
         )
         await self.accept()
 
+        # ?resume_after=<message id> after a dropped connection
+        resume_after = parse_qs(self.scope.get('query_string', b'').decode()).get('resume_after')
+        if resume_after:
+            await self.replay(self.conversation_id, resume_after[0])
+
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name,
         )
+        await self.teardown_chat()
 
     async def receive(self, text_data):
         data = json.loads(text_data)
-        message_content = data.get('message', '').strip()
-        if not message_content:
+        kind = data.get('type')
+        if kind == 'read':
+            self.note_read(self.conversation_id, data.get('message_id'))
+        elif kind == 'typing':
+            await self.typing(self.conversation_id)
+        elif kind == 'presence':
+            await presence.set_status(self.user.id, data.get('status'))
+        else:
+            await self.post_message(self.conversation_id, data.get('message'))
+
+
+class InboxConsumer(ConversationSocket):
+    """
+    One multiplexed socket per tab for all of a user's conversations.
+    URL: ws/inbox/
+
+    Joins every ``chat_<id>`` group the user belongs to plus ``user_<id>``,
+    through which new conversations are announced and auto-subscribed.
+    Client frames carry a ``conversation_id``:
+        {"type": "subscribe" | "unsubscribe", "conversation_id": ...}
+        {"type": "subscribe", "conversation_id": ..., "resume_after": <message id>}
+        {"type": "message", "conversation_id": ..., "message": "..."}
+        {"type": "read", "conversation_id": ..., "message_id": ...}
+        {"type": "typing", "conversation_id": ...}
+        {"type": "presence", "status": "online" | "away"}
+    """
+
+    async def connect(self):
+        self.user = self.scope['user']
+        if self.user.is_anonymous:
+            await self.close()
             return
 
-        # Save to database
-        msg = await self.save_message(message_content)
+        await self.setup_chat()
+        self.user_group_name = chat.user_group(self.user.id)
+        self.subscribed = set(await self.load_conversation_ids())
+        await asyncio.gather(
+            self.channel_layer.group_add(self.user_group_name, self.channel_name),
+            *(self.channel_layer.group_add(chat.room_group(cid), self.channel_name) for cid in self.subscribed),
+        )
+        await self.accept()
+        await self.send(text_data=json.dumps({'type': 'subscribed', 'conversation_ids': sorted(self.subscribed)}))
 
-        # Broadcast to room group
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'chat_message',
-                'message': message_content,
-                'sender_id': self.user.id,
-                'sender_name': self.user.get_full_name() or self.user.username,
-                'sender_initials': self.user.get_initials(),
-                'message_id': str(msg.id),
-                'timestamp': msg.timestamp.strftime('%H:%M'),
-            },
+    async def disconnect(self, close_code):
+        if not hasattr(self, 'subscribed'):
+            return
+        await asyncio.gather(
+            self.channel_layer.group_discard(self.user_group_name, self.channel_name),
+            *(self.channel_layer.group_discard(chat.room_group(cid), self.channel_name) for cid in self.subscribed),
         )
+        await self.teardown_chat()
 
-    async def chat_message(self, event):
-        """Handler for messages broadcast to the group."""
-        await self.send(text_data=json.dumps({
-            'type': 'chat_message',
-            'message': event['message'],
-            'sender_id': event['sender_id'],
-            'sender_name': event['sender_name'],
-            'sender_initials': event['sender_initials'],
-            'message_id': event['message_id'],
-            'timestamp': event['timestamp'],
-        }))
+    async def receive(self, text_data):
+        data = json.loads(text_data)
+        kind = data.get('type')
+        conversation_id = str(data.get('conversation_id') or '')
+        conversation_id = chat.canonical_id(conversation_id) or conversation_id
 
-    # ─── Database helpers ─────────────────────────────────────────────────
+        if kind == 'subscribe':
+            await self.subscribe(conversation_id, data.get('resume_after'))
+        elif kind == 'unsubscribe':
+            if conversation_id in self.subscribed:
+                self.subscribed.discard(conversation_id)
+                await self.channel_layer.group_discard(chat.room_group(conversation_id), self.channel_name)
+            await self.send(text_data=json.dumps({'type': 'unsubscribed', 'conversation_id': conversation_id}))
+        elif kind == 'presence':
+            await presence.set_status(self.user.id, data.get('status'))
+        elif conversation_id not in self.subscribed:
+            await self.send_error(conversation_id, 'Not subscribed')
+        elif kind == 'message':
+            await self.post_message(conversation_id, data.get('message'))
+        elif kind == 'read':
+            self.note_read(conversation_id, data.get('message_id'))
+        elif kind == 'typing':
+            await self.typing(conversation_id)
 
-    @database_sync_to_async
-    def check_participant(self):
-        return ConversationParticipant.objects.filter(
-            conversation_id=self.conversation_id,
-            user=self.user,
-        ).exists()
+    async def subscribe(self, conversation_id, resume_after=None):
+        if conversation_id not in self.subscribed:
+            if not await self.check_participant(conversation_id):
+                await self.send_error(conversation_id, 'Not a participant')
+                return
+            self.subscribed.add(conversation_id)
+            await self.channel_layer.group_add(chat.room_group(conversation_id), self.channel_name)
+        await self.send(text_data=json.dumps({'type': 'subscribed', 'conversation_ids': [conversation_id]}))
+        if resume_after:
+            await self.replay(conversation_id, resume_after)
+
+    async def send_error(self, conversation_id, error):
+        await self.send(text_data=json.dumps({'type': 'error', 'conversation_id': conversation_id, 'error': error}))
+
+    async def conversation_added(self, event):
+        """Handler for conversations created after this socket connected."""
+        conversation_id = event['conversation_id']
+        if conversation_id not in self.subscribed:
+            self.subscribed.add(conversation_id)
+            await self.channel_layer.group_add(chat.room_group(conversation_id), self.channel_name)
+        await self.send(text_data=json.dumps({'type': 'conversation_added', 'conversation_id': conversation_id}))
 
     @database_sync_to_async
-    def save_message(self, content):
-        conversation = Conversation.objects.get(id=self.conversation_id)
-        return Message.objects.create(
-            conversation=conversation,
-            sender=self.user,
-            content=content,
-        )
+    def load_conversation_ids(self):
+        return [str(cid) for cid in self.user.chat_memberships.values_list('conversation_id', flat=True)]
+
+
+class FeedConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer pushing live feed deltas: new post summaries and
+    like / comment count changes.
+    URL: ws/feed/
+
+    Deltas arrive already coalesced by reconnect.live_feed -- at most one
+    batch per publishing process every FEED_COALESCE_WINDOW seconds -- and
+    are relayed as one ``feed_batch`` frame each.
+    """
+
+    async def connect(self):
+        self.user = self.scope['user']
+        if self.user.is_anonymous:
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(FEED_GROUP, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(FEED_GROUP, self.channel_name)
+
+    async def feed_batch(self, event):
+        """Handler for batches published by reconnect.live_feed."""
+        await self.send(text_data=json.dumps({'type': 'feed_batch', 'events': event['events']}))
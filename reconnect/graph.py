@@ -0,0 +1,215 @@
+"""
+In-memory index of the accepted-connection graph.
+
+Every process keeps one ``SocialGraph``: for each user a sorted ``array`` of
+the ids they are connected to, loaded lazily from the accepted Connection
+rows.  Degree, "are these two connected", mutual-connection counts and
+friends-of-friends are then answered from memory instead of with the
+``Q(from_user=..) | Q(to_user=..)`` OR-scans over Connection.
+
+When a Connection change makes a pair connected or unconnected,
+reconnect.signals calls :func:`record_change` in the same transaction: it
+bumps the SocialGraphVersion row and logs the edge as a SocialGraphChange
+under the new version.  The local graph applies the change once it commits.
+The stamp lives in the database rather than a cache so that every worker
+sees it whatever the cache backend: other processes read it at most every
+SOCIAL_GRAPH_CHECK_INTERVAL seconds and replay the logged changes since
+their own version.  Only a gap in the log -- a process more than
+SOCIAL_GRAPH_LOG_LENGTH changes behind, or ``manage.py
+rebuild_social_graph``, which bumps the stamp without logging -- makes a
+process reload everything.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from reconnect.models import Connection, SocialGraphChange, SocialGraphVersion
+
+CHECK_INTERVAL = getattr(settings, 'SOCIAL_GRAPH_CHECK_INTERVAL', 1.0)
+LOG_LENGTH = getattr(settings, 'SOCIAL_GRAPH_LOG_LENGTH', 10000)
+
+_EMPTY = array('q')
+
+
+def current_version():
+    return SocialGraphVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def bump_version():
+    """
+    Advance the shared stamp and return the new value.  Call it inside the
+    transaction that changes the graph: the row lock orders concurrent
+    writers, and a rolled-back change takes its bump with it.
+    """
+    with transaction.atomic():
+        if not SocialGraphVersion.objects.filter(pk=1).update(version=F('version') + 1):
+            SocialGraphVersion.objects.get_or_create(pk=1)
+            SocialGraphVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        return current_version()
+
+
+def record_change(user_id, other_id, connected):
+    """
+    Bump the stamp and log that the pair became connected (or not) under
+    it, for other processes to replay.  Returns the new version.
+    """
+    with transaction.atomic():
+        version = bump_version()
+        SocialGraphChange.objects.create(version=version, user_id=user_id, other_id=other_id, connected=connected)
+        if version % 1000 == 0:
+            SocialGraphChange.objects.filter(version__lte=version - LOG_LENGTH).delete()
+        return version
+
+
+def _insert(peers, user_id):
+    i = bisect_left(peers, user_id)
+    if i == len(peers) or peers[i] != user_id:
+        peers.insert(i, user_id)
+
+
+def _remove(peers, user_id):
+    i = bisect_left(peers, user_id)
+    if i < len(peers) and peers[i] == user_id:
+        del peers[i]
+
+
+class SocialGraph:
+    __slots__ = ('_adjacency', '_lock', '_version', '_checked_at')
+
+    def __init__(self):
+        self._adjacency = None
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+
+    # ─── Loading ──────────────────────────────────────────────────────────
+
+    def rebuild(self):
+        """Reload every accepted connection from the database."""
+        with self._lock, transaction.atomic():
+            version = current_version()
+            neighbours = defaultdict(list)
+            rows = Connection.objects.filter(status='accepted').values_list('from_user_id', 'to_user_id')
+            for from_id, to_id in rows.iterator(chunk_size=10000):
+                neighbours[from_id].append(to_id)
+                neighbours[to_id].append(from_id)
+            # A pair may be accepted in both directions; store it once
+            adjacency = {uid: array('q', sorted(set(ids))) for uid, ids in neighbours.items()}
+            self._adjacency = adjacency
+            self._version = version
+            self._checked_at = time.monotonic()
+            return adjacency
+
+    def invalidate(self):
+        """Make every process, this one included, reload on next use."""
+        with self._lock:
+            bump_version()
+            self._adjacency = None
+
+    def _loaded(self):
+        adjacency = self._adjacency
+        if adjacency is None:
+            return self.rebuild()
+        if time.monotonic() - self._checked_at >= CHECK_INTERVAL:
+            self._checked_at = time.monotonic()
+            version = current_version()
+            if version != self._version and not self._catch_up(version):
+                return self.rebuild()
+        return self._adjacency
+
+    def _catch_up(self, version):
+        """
+        Replay the logged changes up to ``version``.  Returns False if the
+        log cannot bring this copy up to date, i.e. it needs a rebuild.
+        """
+        with self._lock:
+            if self._adjacency is None or version < self._version:
+                return False
+            changes = list(SocialGraphChange.objects.filter(
+                version__gt=self._version, version__lte=version,
+            ).order_by('version').values_list('version', 'user_id', 'other_id', 'connected'))
+            if [change[0] for change in changes] != list(range(self._version + 1, version + 1)):
+                return False
+            for _, user_id, other_id, connected in changes:
+                change = _insert if connected else _remove
+                change(self._adjacency.setdefault(user_id, array('q')), other_id)
+                change(self._adjacency.setdefault(other_id, array('q')), user_id)
+            self._version = version
+            return True
+
+    def _peers(self, user_id):
+        return self._loaded().get(user_id, _EMPTY)
+
+    # ─── Incremental updates ──────────────────────────────────────────────
+
+    def connect(self, user_id, other_id, version):
+        self._apply(user_id, other_id, version, _insert)
+
+    def disconnect(self, user_id, other_id, version):
+        self._apply(user_id, other_id, version, _remove)
+
+    def _apply(self, user_id, other_id, version, change):
+        """Apply a committed change that ``record_change`` stamped ``version``."""
+        with self._lock:
+            if self._adjacency is None or version <= self._version:
+                return  # loaded fresh on first use, or already replayed
+            if version != self._version + 1:
+                # Someone else changed the graph since we last looked:
+                # replay the log on next use
+                self._checked_at = 0.0
+                return
+            change(self._adjacency.setdefault(user_id, array('q')), other_id)
+            change(self._adjacency.setdefault(other_id, array('q')), user_id)
+            self._version = version
+
+    # ─── Queries ──────────────────────────────────────────────────────────
+
+    def __len__(self):
+        """Number of users with at least one connection."""
+        return sum(1 for peers in self._loaded().values() if peers)
+
+    def peers(self, user_id):
+        """Ids of everyone ``user_id`` is connected to, ascending."""
+        return list(self._peers(user_id))
+
+    def degree(self, user_id):
+        return len(self._peers(user_id))
+
+    def are_connected(self, user_id, other_id):
+        peers = self._peers(user_id)
+        i = bisect_left(peers, other_id)
+        return i < len(peers) and peers[i] == other_id
+
+    def mutual_count(self, user_id, other_id):
+        mine, theirs = self._peers(user_id), self._peers(other_id)
+        if len(mine) > len(theirs):
+            mine, theirs = theirs, mine
+        return len(set(mine).intersection(theirs))
+
+    def mutual_counts(self, user_id, other_ids):
+        """``{other_id: mutual connections with user_id}`` for a page of users."""
+        mine = set(self._peers(user_id))
+        return {other_id: len(mine.intersection(self._peers(other_id))) for other_id in other_ids}
+
+    def second_degree(self, user_id, limit=None):
+        """
+        People ``user_id`` is not connected to but shares connections with,
+        as ``[(other_id, mutual_count)]`` with the most mutuals first.
+        """
+        mine = self._peers(user_id)
+        counts = Counter()
+        for peer_id in mine:
+            counts.update(self._peers(peer_id))
+        counts.pop(user_id, None)
+        for peer_id in mine:
+            counts.pop(peer_id, None)
+        return counts.most_common(limit)
+
+
+graph = SocialGraph()
@@ -0,0 +1,80 @@
+"""
+Downscaled derivatives of uploaded images.
+
+Originals are kept as uploaded.  Under ``derivatives/`` we write resized, recompressed
+JPEG variants once, at upload time, and record their storage names on the
+model (``Post.image_variants`` / ``CustomUser.profile_picture_variants``) so
+API payloads can hand out small URLs instead of multi-megabyte originals.
+"""
+import io
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# name: (width, height, crop).  Cropped variants are filled to the exact
+# box; the others are only bounded by it and keep their aspect ratio.
+AVATAR_VARIANTS = {
+    'sm': (48, 48, True),
+    'md': (128, 128, True),
+}
+POST_IMAGE_VARIANTS = {
+    'feed': (1080, 1350, False),
+    'thumb': (320, 320, True),
+}
+
+JPEG_QUALITY = 82
+
+
+def _load(fieldfile):
+    try:
+        fieldfile.open('rb')
+        with Image.open(fieldfile) as img:
+            img = ImageOps.exif_transpose(img)
+            img.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    finally:
+        fieldfile.close()
+
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        flat = Image.new('RGB', img.size, (255, 255, 255))
+        flat.paste(img, mask=img.getchannel('A'))
+        return flat
+    return img.convert('RGB')
+
+
+def generate_variants(fieldfile, spec):
+    """
+    Write every variant in ``spec`` for ``fieldfile`` and return
+    ``{variant: storage name}``.  Unreadable images yield ``{}`` so an upload
+    never fails just because its derivatives could not be produced.
+    """
+    if not fieldfile:
+        return {}
+    img = _load(fieldfile)
+    if img is None:
+        return {}
+
+    storage = fieldfile.storage
+    names = {}
+    for variant, (width, height, crop) in spec.items():
+        if crop:
+            out = ImageOps.fit(img, (width, height), Image.LANCZOS)
+        else:
+            out = img.copy()
+            out.thumbnail((width, height), Image.LANCZOS)
+        buf = io.BytesIO()
+        out.save(buf, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+        # Derived from the full original name, so it can never collide with an upload
+        name = f'derivatives/{fieldfile.name}.{variant}.jpg'
+        if storage.exists(name):
+            storage.delete(name)
+        names[variant] = storage.save(name, ContentFile(buf.getvalue()))
+    return names
+
+
+def delete_variants(storage, variants):
+    for name in variants.values():
+        storage.delete(name)
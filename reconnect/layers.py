@@ -0,0 +1,444 @@
+"""
+Channel layer that works across worker processes.
+
+``InMemoryChannelLayer`` keeps groups inside one process, so with several
+Daphne workers a ``chat_<id>`` group_send only reaches the sockets that
+happen to live on the sending worker.  ``BrokeredChannelLayer`` keeps
+queues and group membership in a broker shared by every worker instead:
+
+* ``SQLiteBroker`` -- WAL-mode SQLite files, sharded by group / inbox name.
+  Every worker on the host sees the same files; this is the default.
+* ``MemoryBroker`` -- a process-local stand-in with the same interface, for
+  tests and single-process development.
+
+Any object with the broker methods below (e.g. one backed by Redis) can be
+plugged in through ``CHANNEL_LAYERS['default']['CONFIG']['broker']``.
+
+Each process has one receive poller.  All of its specific channels share an
+inbox (the part of the channel name up to ``!``), so a poll is a single
+indexed lookup per process no matter how many sockets it holds.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import defaultdict, deque
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from django.utils.module_loading import import_string
+
+POLL_BATCH = 200
+PURGE_INTERVAL = 30.0
+
+
+def _shard(name, shards):
+    return zlib.crc32(name.encode()) % shards
+
+
+def _inbox(channel):
+    return channel[:channel.find('!') + 1] if '!' in channel else channel
+
+
+# ─── Brokers ─────────────────────────────────────────────────────────────────
+#
+# push_many(items, now)                 items: [(channel, payload, expires, capacity)];
+#                                       returns the channels that were full
+# pop(inboxes, now, limit)              -> [(channel, payload, expires)] in send order
+# group_add(group, channel, expires) / group_discard(group, channel)
+# group_channels(group, now)            -> [channel]
+# record(group, sent, dropped) / stats(group, now)
+# purge(now) / flush()
+
+class MemoryBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = defaultdict(deque)       # inbox -> deque[(channel, payload, expires)]
+        self._groups = defaultdict(dict)        # group -> {channel: expires}
+        self._stats = defaultdict(lambda: [0, 0])
+
+    def push_many(self, items, now):
+        full = []
+        with self._lock:
+            for channel, payload, expires, capacity in items:
+                queue = self._queues[_inbox(channel)]
+                if sum(1 for c, _, e in queue if c == channel and e >= now) >= capacity:
+                    full.append(channel)
+                    continue
+                queue.append((channel, payload, expires))
+        return full
+
+    def pop(self, inboxes, now, limit):
+        rows = []
+        with self._lock:
+            for inbox in inboxes:
+                queue = self._queues.get(inbox)
+                while queue and len(rows) < limit:
+                    row = queue.popleft()
+                    if row[2] >= now:
+                        rows.append(row)
+        return rows
+
+    def group_add(self, group, channel, expires):
+        with self._lock:
+            self._groups[group][channel] = expires
+
+    def group_discard(self, group, channel):
+        with self._lock:
+            members = self._groups.get(group)
+            if members is not None:
+                members.pop(channel, None)
+                if not members:
+                    del self._groups[group]
+
+    def group_channels(self, group, now):
+        with self._lock:
+            return [c for c, expires in self._groups.get(group, {}).items() if expires >= now]
+
+    def record(self, group, sent, dropped):
+        with self._lock:
+            self._stats[group][0] += sent
+            self._stats[group][1] += dropped
+
+    def stats(self, group, now):
+        sent, dropped = self._stats.get(group, (0, 0))
+        return {'members': len(self.group_channels(group, now)), 'sent': sent, 'dropped': dropped}
+
+    def purge(self, now):
+        with self._lock:
+            dead = set()
+            for queue in self._queues.values():
+                dead.update(c for c, _, e in queue if e < now)
+                live = [row for row in queue if row[2] >= now]
+                queue.clear()
+                queue.extend(live)
+            for members in self._groups.values():
+                for channel, expires in list(members.items()):
+                    if expires < now or channel in dead:
+                        del members[channel]
+
+    def flush(self):
+        with self._lock:
+            self._queues.clear()
+            self._groups.clear()
+            self._stats.clear()
+
+
+class SQLiteBroker:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS message (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            inbox TEXT NOT NULL,
+            channel TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            expires REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS message_inbox ON message (inbox, id);
+        CREATE INDEX IF NOT EXISTS message_channel ON message (channel, expires);
+        CREATE TABLE IF NOT EXISTS membership (
+            grp TEXT NOT NULL,
+            channel TEXT NOT NULL,
+            expires REAL NOT NULL,
+            PRIMARY KEY (grp, channel)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS group_stats (
+            grp TEXT PRIMARY KEY,
+            sent INTEGER NOT NULL DEFAULT 0,
+            dropped INTEGER NOT NULL DEFAULT 0
+        );
+    """
+
+    def __init__(self, location, shards=4):
+        self.location = str(location)
+        self.shards = shards
+        self._local = threading.local()
+        os.makedirs(self.location, exist_ok=True)
+        for i in range(shards):
+            self._conn(i).executescript(self.SCHEMA)
+
+    def _conn(self, shard):
+        conns = getattr(self._local, 'conns', None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn = conns.get(shard)
+        if conn is None:
+            path = os.path.join(self.location, f'shard{shard}.sqlite3')
+            # Autocommit; write transactions are opened explicitly with BEGIN IMMEDIATE.
+            conn = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conns[shard] = conn
+        return conn
+
+    def _write(self, shard):
+        conn = self._conn(shard)
+        conn.execute('BEGIN IMMEDIATE')
+        return conn
+
+    def push_many(self, items, now):
+        by_shard = defaultdict(list)
+        for item in items:
+            by_shard[_shard(_inbox(item[0]), self.shards)].append(item)
+        full = []
+        for shard, batch in by_shard.items():
+            conn = self._write(shard)
+            try:
+                for channel, payload, expires, capacity in batch:
+                    (queued,) = conn.execute(
+                        'SELECT COUNT(*) FROM message WHERE channel = ? AND expires >= ?', (channel, now),
+                    ).fetchone()
+                    if queued >= capacity:
+                        full.append(channel)
+                        continue
+                    conn.execute(
+                        'INSERT INTO message (inbox, channel, payload, expires) VALUES (?, ?, ?, ?)',
+                        (_inbox(channel), channel, payload, expires),
+                    )
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        return full
+
+    def pop(self, inboxes, now, limit):
+        by_shard = defaultdict(list)
+        for inbox in inboxes:
+            by_shard[_shard(inbox, self.shards)].append(inbox)
+        rows = []
+        for shard, names in by_shard.items():
+            conn = self._conn(shard)
+            marks = ','.join('?' * len(names))
+            # Cheap read first: an idle poll never takes the write lock.
+            if conn.execute(f'SELECT 1 FROM message WHERE inbox IN ({marks}) LIMIT 1', names).fetchone() is None:
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                found = conn.execute(
+                    f'SELECT id, channel, payload, expires FROM message WHERE inbox IN ({marks}) '
+                    f'ORDER BY id LIMIT ?', (*names, limit),
+                ).fetchall()
+                if found:
+                    conn.execute(f'DELETE FROM message WHERE id IN ({",".join("?" * len(found))})',
+                                 [row[0] for row in found])
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            rows += [(channel, payload, expires) for _, channel, payload, expires in found if expires >= now]
+        return rows
+
+    def group_add(self, group, channel, expires):
+        self._conn(_shard(group, self.shards)).execute(
+            'INSERT INTO membership (grp, channel, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (grp, channel) DO UPDATE SET expires = excluded.expires',
+            (group, channel, expires),
+        )
+
+    def group_discard(self, group, channel):
+        self._conn(_shard(group, self.shards)).execute(
+            'DELETE FROM membership WHERE grp = ? AND channel = ?', (group, channel),
+        )
+
+    def group_channels(self, group, now):
+        return [row[0] for row in self._conn(_shard(group, self.shards)).execute(
+            'SELECT channel FROM membership WHERE grp = ? AND expires >= ?', (group, now),
+        )]
+
+    def record(self, group, sent, dropped):
+        self._conn(_shard(group, self.shards)).execute(
+            'INSERT INTO group_stats (grp, sent, dropped) VALUES (?, ?, ?) '
+            'ON CONFLICT (grp) DO UPDATE SET sent = sent + excluded.sent, dropped = dropped + excluded.dropped',
+            (group, sent, dropped),
+        )
+
+    def stats(self, group, now):
+        conn = self._conn(_shard(group, self.shards))
+        row = conn.execute('SELECT sent, dropped FROM group_stats WHERE grp = ?', (group,)).fetchone()
+        sent, dropped = row or (0, 0)
+        return {'members': len(self.group_channels(group, now)), 'sent': sent, 'dropped': dropped}
+
+    def purge(self, now):
+        # A channel with an expired message has stopped reading; drop it from
+        # its groups too so group_send stops queueing for it.
+        dead = set()
+        for shard in range(self.shards):
+            conn = self._write(shard)
+            try:
+                dead.update(row[0] for row in conn.execute(
+                    'SELECT DISTINCT channel FROM message WHERE expires < ?', (now,)))
+                conn.execute('DELETE FROM message WHERE expires < ?', (now,))
+                conn.execute('DELETE FROM membership WHERE expires < ?', (now,))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        dead = list(dead)
+        for shard in range(self.shards):
+            conn = self._conn(shard)
+            for i in range(0, len(dead), 500):
+                chunk = dead[i:i + 500]
+                conn.execute(f'DELETE FROM membership WHERE channel IN ({",".join("?" * len(chunk))})', chunk)
+
+    def flush(self):
+        for shard in range(self.shards):
+            self._conn(shard).executescript(
+                'DELETE FROM message; DELETE FROM membership; DELETE FROM group_stats;')
+
+
+# ─── Layer ───────────────────────────────────────────────────────────────────
+
+class BrokeredChannelLayer(BaseChannelLayer):
+    """
+    CONFIG: ``broker`` (dotted path or instance), ``broker_options`` (kwargs for
+    the broker class), ``expiry``, ``group_expiry``, ``capacity``,
+    ``channel_capacity`` and ``poll_interval`` (longest idle wait, seconds).
+    Messages must be JSON-serialisable.
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, broker='reconnect.layers.MemoryBroker', broker_options=None,
+                 expiry=60, group_expiry=86400, capacity=100, channel_capacity=None,
+                 poll_interval=0.05, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.channel_capacity = self.compile_capacities(self.channel_capacity)
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        if isinstance(broker, str):
+            broker = import_string(broker)(**(broker_options or {}))
+        self.broker = broker
+        self.client_prefix = uuid.uuid4().hex
+        self._loop = None
+        self._queues = {}
+        self._poller = None
+        self._wakeup = None
+        self._last_purge = 0.0
+
+    def _encode(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        return json.dumps(message, separators=(',', ':'))
+
+    def _nudge(self, channels):
+        """Cut the poller's idle wait short if we just queued for ourselves."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        inboxes = self._inboxes()
+        if any(_inbox(c) in inboxes for c in channels):
+            # Callers may be on another loop or a worker thread
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _inboxes(self):
+        return {_inbox(channel) for channel in self._queues}
+
+    # ─── Channels ─────────────────────────────────────────────────────────
+
+    async def send(self, channel, message):
+        payload = self._encode(channel, message)
+        now = time.time()
+        full = await asyncio.to_thread(
+            self.broker.push_many,
+            [(channel, payload, now + self.expiry, self.get_capacity(channel))], now,
+        )
+        if full:
+            raise ChannelFull(channel)
+        self._nudge([channel])
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Queues and the poller belong to one event loop
+            self._loop, self._queues, self._poller = loop, {}, None
+            self._wakeup = asyncio.Event()
+
+        queue = self._queues.get(channel)
+        if queue is None:
+            queue = self._queues[channel] = asyncio.Queue()
+        if self._poller is None or self._poller.done():
+            self._poller = loop.create_task(self._poll())
+        self._wakeup.set()
+
+        try:
+            while True:
+                expires, message = await queue.get()
+                if expires >= time.time():
+                    return message
+        except asyncio.CancelledError:
+            # The consumer is going away; nothing will read this channel again.
+            self._queues.pop(channel, None)
+            raise
+
+    async def new_channel(self, prefix='specific'):
+        return f'{prefix}.{self.client_prefix}!{uuid.uuid4().hex[:12]}'
+
+    async def _poll(self):
+        delay = 0.005
+        while self._queues:
+            self._wakeup.clear()
+            now = time.time()
+            if now - self._last_purge > PURGE_INTERVAL:
+                self._last_purge = now
+                await asyncio.to_thread(self.broker.purge, now)
+            rows = await asyncio.to_thread(self.broker.pop, self._inboxes(), now, POLL_BATCH)
+            for channel, payload, expires in rows:
+                queue = self._queues.get(channel)
+                # Capacity also bounds what a slow reader can pile up locally
+                if queue is not None and queue.qsize() < self.get_capacity(channel):
+                    queue.put_nowait((expires, json.loads(payload)))
+            if rows:
+                delay = 0.005
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                delay = min(delay * 2, self.poll_interval)
+
+    # ─── Groups ───────────────────────────────────────────────────────────
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await asyncio.to_thread(self.broker.group_add, group, channel, time.time() + self.group_expiry)
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await asyncio.to_thread(self.broker.group_discard, group, channel)
+
+    async def group_send(self, group, message):
+        self.require_valid_group_name(group)
+        assert isinstance(message, dict), 'message is not a dict'
+        payload = json.dumps(message, separators=(',', ':'))
+        await asyncio.to_thread(self._group_send, group, payload)
+
+    def _group_send(self, group, payload):
+        now = time.time()
+        channels = self.broker.group_channels(group, now)
+        if not channels:
+            return
+        # A full member just misses this message, as with the other layers.
+        full = self.broker.push_many(
+            [(c, payload, now + self.expiry, self.get_capacity(c)) for c in channels], now,
+        )
+        self.broker.record(group, len(channels) - len(full), len(full))
+        self._nudge(channels)
+
+    async def group_stats(self, group):
+        """``{'members', 'sent', 'dropped'}`` for ``group``, across all workers."""
+        self.require_valid_group_name(group)
+        return await asyncio.to_thread(self.broker.stats, group, time.time())
+
+    # ─── Flush extension ──────────────────────────────────────────────────
+
+    async def flush(self):
+        await asyncio.to_thread(self.broker.flush)
+        self._queues = {}
+
+    async def close(self):
+        pass
@@ -0,0 +1,161 @@
+"""
+Write-behind aggregation for post likes.
+
+With ``settings.LIKE_WRITE_BEHIND`` on, toggle_like does not write.  It
+records the viewer's intent in a per-process buffer keyed by
+``(post_id, user_id)`` -- toggling twice cancels out, so each pair yields at
+most one row change -- and answers with the persisted count plus the
+buffered delta.  The buffer is flushed with one bulk insert, one bulk delete
+and one counter recount once ``LIKE_FLUSH_BATCH`` intents are pending, or
+at most ``LIKE_FLUSH_INTERVAL`` seconds after the first one arrived.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from reconnect.models import CustomUser, Post, PostLike
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND = getattr(settings, 'LIKE_WRITE_BEHIND', False)
+FLUSH_INTERVAL = getattr(settings, 'LIKE_FLUSH_INTERVAL', 2.0)
+FLUSH_BATCH = getattr(settings, 'LIKE_FLUSH_BATCH', 500)
+
+
+class LikeBuffer:
+    def __init__(self, flush_interval=FLUSH_INTERVAL, flush_batch=FLUSH_BATCH):
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        # (post_id, user_id) -> [liked, persisted_liked]
+        self._pending = {}
+        self._inflight = {}
+        # post_id -> net like delta not yet visible in Post.likes_count
+        self._deltas = Counter()
+        self._inflight_deltas = Counter()
+
+    # ─── Reads ────────────────────────────────────────────────────────────
+
+    def overlay(self, post_ids, user_id):
+        """Return ``(count_deltas, liked_overrides)`` for posts about to be rendered."""
+        with self._lock:
+            deltas = {pid: self._deltas[pid] + self._inflight_deltas[pid] for pid in post_ids}
+            liked = {}
+            for source in (self._inflight, self._pending):
+                for pid in post_ids:
+                    entry = source.get((pid, user_id))
+                    if entry is not None:
+                        liked[pid] = entry[0]
+        return deltas, liked
+
+    # ─── Writes ───────────────────────────────────────────────────────────
+
+    def toggle(self, post_id, user_id):
+        """Flip ``user_id``'s like on ``post_id``; returns ``(liked, buffered_count)``."""
+        key = (post_id, user_id)
+        with self._lock:
+            known = self._pending.get(key) or self._inflight.get(key)
+        persisted = known[0] if known else PostLike.objects.filter(post_id=post_id, user_id=user_id).exists()
+
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = self._pending[key] = [persisted, persisted]
+            entry[0] = not entry[0]
+            self._deltas[post_id] += 1 if entry[0] else -1
+            if entry[0] == entry[1]:
+                del self._pending[key]
+            liked = entry[0]
+            full = len(self._pending) >= self.flush_batch
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if full:
+            self.flush()
+        base = Post.objects.filter(id=post_id).values_list('likes_count', flat=True).first() or 0
+        deltas, _ = self.overlay([post_id], user_id)
+        return liked, max(0, base + deltas[post_id])
+
+    def flush(self):
+        """Apply every buffered intent.  Returns the number of intents written."""
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+                self._inflight_deltas, self._deltas = self._deltas, Counter()
+            if not batch:
+                return 0
+
+            try:
+                written = self._apply(batch)
+            except Exception:
+                logger.exception('Like flush failed; re-queueing %d intent(s)', len(batch))
+                with self._lock:
+                    for key, entry in batch.items():
+                        if key not in self._pending:
+                            self._pending[key] = entry
+                    self._deltas.update(self._inflight_deltas)
+                    # Retry on our own rather than waiting for the next toggle
+                    if self._timer is None:
+                        self._timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+                        self._timer.daemon = True
+                        self._timer.start()
+                raise
+            finally:
+                with self._lock:
+                    self._inflight = {}
+                    self._inflight_deltas = Counter()
+            return written
+
+    def _apply(self, batch):
+        # A post or user deleted since the toggle would fail the whole insert
+        # on its foreign key, batch after batch; its intents are moot anyway.
+        live_posts = set(Post.objects.filter(id__in={pid for pid, _ in batch}).values_list('id', flat=True))
+        live_users = set(CustomUser.objects.filter(id__in={uid for _, uid in batch}).values_list('id', flat=True))
+        orphaned = [key for key in batch if key[0] not in live_posts or key[1] not in live_users]
+        if orphaned:
+            logger.warning('Dropping %d like intent(s) for deleted posts or users', len(orphaned))
+            batch = {key: entry for key, entry in batch.items() if key[0] in live_posts and key[1] in live_users}
+
+        likes = [key for key, (liked, _) in batch.items() if liked]
+        unlikes = [key for key, (liked, _) in batch.items() if not liked]
+        with transaction.atomic():
+            PostLike.objects.bulk_create(
+                [PostLike(post_id=pid, user_id=uid) for pid, uid in likes],
+                ignore_conflicts=True,
+                batch_size=500,
+            )
+            for i in range(0, len(unlikes), 200):
+                q = Q()
+                for pid, uid in unlikes[i:i + 200]:
+                    q |= Q(post_id=pid, user_id=uid)
+                PostLike.objects.filter(q).delete()
+            # Recount rather than add deltas: other processes may have raced us.
+            post_ids = sorted({pid for pid, _ in batch})
+            for i in range(0, len(post_ids), 500):
+                Post.recount(post_ids[i:i + 500])
+        return len(batch)
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            pass  # already logged; retried on the next flush
+        finally:
+            connection.close()
+
+
+buffer = LikeBuffer()
+atexit.register(buffer.flush)
@@ -0,0 +1,95 @@
+"""
+Compact feed deltas pushed to FeedConsumer sockets (ws/feed/).
+
+Views call these helpers after a write; once the surrounding transaction
+commits, the delta is queued in this process's ``FeedPublisher``.  Every
+FEED_COALESCE_WINDOW seconds the publisher sends everything queued as one
+``feed.batch`` group send, keeping only the latest delta per post and kind
+-- so a viral post costs the channel layer one message per window, not one
+per like.
+"""
+import atexit
+import logging
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+FEED_GROUP = 'feed'
+BODY_PREVIEW_CHARS = 500
+COALESCE_WINDOW = getattr(settings, 'FEED_COALESCE_WINDOW', 1.0)
+
+
+class FeedPublisher:
+    def __init__(self, window=COALESCE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._timer = None
+        # (type, post_id) -> latest delta, in first-seen order
+        self._pending = {}
+
+    def add(self, event):
+        with self._lock:
+            self._pending[(event['type'], event['post_id'])] = event
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Send everything queued as one batch.  Returns the number of deltas sent."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            events, self._pending = list(self._pending.values()), {}
+        if not events:
+            return 0
+        try:
+            async_to_sync(get_channel_layer().group_send)(FEED_GROUP, {'type': 'feed.batch', 'events': events})
+        except Exception:
+            # Live updates are best-effort; the writes themselves already succeeded.
+            logger.exception('Could not publish %d feed event(s)', len(events))
+        return len(events)
+
+
+publisher = FeedPublisher()
+atexit.register(publisher.flush)
+
+
+def publish(event):
+    transaction.on_commit(lambda: publisher.add(event))
+
+
+def post_created(post):
+    author = post.author
+    publish({
+        'type': 'post_created',
+        'post_id': post.id,
+        'post': {
+            'id': post.id,
+            'post_type': post.post_type,
+            'title': post.title,
+            'body': post.body[:BODY_PREVIEW_CHARS],
+            'image': post.image_url('feed'),
+            'author_id': author.id,
+            'author_name': author.get_full_name() or author.username,
+            'author_department': author.department,
+            'author_profile_picture': author.avatar_url(),
+            'likes': 0,
+            'comments': 0,
+            'created_at': post.created_at.strftime('%b %d, %Y %H:%M'),
+        },
+    })
+
+
+def likes_changed(post_id, count):
+    publish({'type': 'post_likes', 'post_id': post_id, 'likes': count})
+
+
+def comments_changed(post_id, count):
+    publish({'type': 'post_comments', 'post_id': post_id, 'comments': count})
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from reconnect import images
+from reconnect.models import CustomUser, Post
+
+
+class Command(BaseCommand):
+    help = 'Generate resized variants for existing post images and profile pictures.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate variants that already exist.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        users = CustomUser.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        if not options['force']:
+            posts = posts.filter(image_variants={})
+            users = users.filter(profile_picture_variants={})
+
+        done = 0
+        for post in posts.only('id', 'image', 'image_variants').iterator(chunk_size=200):
+            post.image_variants = images.generate_variants(post.image, images.POST_IMAGE_VARIANTS)
+            post.save(update_fields=['image_variants'])
+            done += 1
+        self.stdout.write(f'Post images processed: {done}')
+
+        done = 0
+        for user in users.only('id', 'profile_picture', 'profile_picture_variants').iterator(chunk_size=200):
+            user.profile_picture_variants = images.generate_variants(user.profile_picture, images.AVATAR_VARIANTS)
+            user.save(update_fields=['profile_picture_variants'])
+            done += 1
+        self.stdout.write(f'Profile pictures processed: {done}')
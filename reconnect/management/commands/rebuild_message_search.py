@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reconnect import search
+from reconnect.models import Message
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text index over chat messages (e.g. after VACUUM or a bulk import).'
+
+    def handle(self, *args, **options):
+        try:
+            search.rebuild()
+        except search.SearchUnavailable as exc:
+            raise CommandError(f'Message search needs SQLite FTS5, not {exc}.')
+        self.stdout.write(self.style.SUCCESS(f'Indexed {Message.objects.count()} message(s).'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from reconnect.graph import graph
+
+
+class Command(BaseCommand):
+    help = 'Make every process reload its in-memory connection graph (e.g. after editing Connection rows in bulk).'
+
+    def handle(self, *args, **options):
+        graph.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Social graph reloaded ({len(graph)} connected user(s)).'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from reconnect import timeline
+from reconnect.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized home timelines from the current connection graph.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild this user ID (may be repeated).')
+
+    def handle(self, *args, **options):
+        user_ids = CustomUser.objects.order_by('id').values_list('id', flat=True)
+        if options['user_ids']:
+            user_ids = user_ids.filter(id__in=options['user_ids'])
+
+        rebuilt = 0
+        for user_id in user_ids.iterator(chunk_size=500):
+            timeline.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} timeline(s).'))
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reconnect import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute "people you may know" suggestions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only recompute this user ID (may be repeated).')
+        parser.add_argument('--stale', type=float, metavar='HOURS',
+                            help='Only recompute lists older than this many hours (or missing).')
+
+    def handle(self, *args, **options):
+        if options['user_ids']:
+            user_ids = options['user_ids']
+        elif options['stale'] is not None:
+            cutoff = timezone.now() - timedelta(hours=options['stale'])
+            user_ids = list(recommendations.stale_user_ids(cutoff))
+        else:
+            users, rows = recommendations.rebuild_all()
+            self.stdout.write(self.style.SUCCESS(f'Recomputed {users} user(s), {rows} suggestion(s).'))
+            return
+
+        rows = recommendations.refresh(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {len(user_ids)} user(s), {rows} suggestion(s).'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from reconnect.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Backfill / repair the denormalized Post.likes_count and Post.comments_count columns.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post', type=int, action='append', dest='post_ids',
+                            help='Only check this post ID (may be repeated).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted posts without fixing them.')
+
+    def handle(self, *args, **options):
+        expressions = Post.counter_expressions()
+        qs = Post.objects.annotate(
+            real_likes=expressions['likes_count'],
+            real_comments=expressions['comments_count'],
+        )
+        if options['post_ids']:
+            qs = qs.filter(id__in=options['post_ids'])
+
+        drifted = list(
+            qs.exclude(likes_count=F('real_likes'), comments_count=F('real_comments'))
+            .values_list('id', flat=True)
+        )
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('All post counters are in sync.'))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(drifted)} post(s) out of sync: {drifted[:20]}')
+            return
+
+        # Chunk to stay under SQLite's bound-parameter limit.
+        fixed = 0
+        for i in range(0, len(drifted), 500):
+            fixed += Post.recount(drifted[i:i + 500])
+        self.stdout.write(self.style.SUCCESS(f'Repaired counters on {fixed} post(s).'))
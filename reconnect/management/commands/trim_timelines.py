@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reconnect import timeline
+
+
+class Command(BaseCommand):
+    help = 'Cut home timelines that grew past TIMELINE_MAX_LENGTH back down (run periodically).'
+
+    def handle(self, *args, **options):
+        trimmed = deleted = 0
+        for user_id in list(timeline.overgrown_user_ids()):
+            deleted += timeline.trim(user_id)
+            trimmed += 1
+        self.stdout.write(self.style.SUCCESS(f'Trimmed {trimmed} timeline(s), {deleted} entries removed.'))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('reconnect', 'Post')
+    PostLike = apps.get_model('reconnect', 'PostLike')
+    PostComment = apps.get_model('reconnect', 'PostComment')
+    Post.objects.update(
+        likes_count=Coalesce(Subquery(
+            PostLike.objects.filter(post=OuterRef('pk'))
+            .values('post').annotate(n=Count('id')).values('n')
+        ), 0),
+        comments_count=Coalesce(Subquery(
+            PostComment.objects.filter(post=OuterRef('pk'))
+            .values('post').annotate(n=Count('id')).values('n')
+        ), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reconnect', '0005_opportunity_post_postcomment_project_connection_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
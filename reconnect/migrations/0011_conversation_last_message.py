@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_last_message(apps, schema_editor):
+    Conversation = apps.get_model('reconnect', 'Conversation')
+    ConversationParticipant = apps.get_model('reconnect', 'ConversationParticipant')
+    Message = apps.get_model('reconnect', 'Message')
+    for convo_id in Conversation.objects.values_list('id', flat=True).iterator():
+        last = Message.objects.filter(conversation_id=convo_id).order_by('-timestamp').first()
+        if last is None:
+            continue
+        Conversation.objects.filter(id=convo_id).update(
+            last_message_at=last.timestamp,
+            last_message_preview=last.content[:100],
+            last_sender_id=last.sender_id,
+        )
+        ConversationParticipant.objects.filter(conversation_id=convo_id).update(last_message_at=last.timestamp)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reconnect', '0010_postcomment_post_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='conversationparticipant',
+            index=models.Index(fields=['user', 'last_message_at'], name='participant_inbox_idx'),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
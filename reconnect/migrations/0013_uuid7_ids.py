@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:35
+
+import reconnect.ids
+from django.db import migrations, models
+
+
+def rekey_messages(apps, schema_editor):
+    """
+    Re-issue existing message ids as UUIDv7 stamped with each message's
+    timestamp, so old history sorts and pages by id like new messages do.
+    Conversation ids are left alone: they are part of chat URLs.
+    """
+    Message = apps.get_model('reconnect', 'Message')
+    generate = reconnect.ids.UUID7Generator()
+    rows = Message.objects.order_by('timestamp', 'id').values_list('id', 'timestamp')
+    for old_id, timestamp in rows.iterator():
+        Message.objects.filter(id=old_id).update(id=generate(at=timestamp))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reconnect', '0012_message_history_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='message',
+            options={'ordering': ['id']},
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_history_idx',
+        ),
+        migrations.AlterField(
+            model_name='conversation',
+            name='id',
+            field=models.UUIDField(default=reconnect.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='id',
+            field=models.UUIDField(default=reconnect.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(rekey_messages, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'id'], name='message_history_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:46
+
+from django.db import migrations
+
+# External-content FTS5 index over reconnect_message.content, kept in sync by
+# triggers so every write path (save, bulk_create, cascades) is covered.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE reconnect_message_fts USING fts5(
+        content,
+        content='reconnect_message',
+        content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER reconnect_message_fts_ai AFTER INSERT ON reconnect_message BEGIN
+        INSERT INTO reconnect_message_fts(rowid, content) VALUES (new.rowid, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER reconnect_message_fts_ad AFTER DELETE ON reconnect_message BEGIN
+        INSERT INTO reconnect_message_fts(reconnect_message_fts, rowid, content)
+        VALUES ('delete', old.rowid, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER reconnect_message_fts_au AFTER UPDATE OF content ON reconnect_message BEGIN
+        INSERT INTO reconnect_message_fts(reconnect_message_fts, rowid, content)
+        VALUES ('delete', old.rowid, old.content);
+        INSERT INTO reconnect_message_fts(rowid, content) VALUES (new.rowid, new.content);
+    END
+    """,
+    "INSERT INTO reconnect_message_fts(reconnect_message_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS reconnect_message_fts_au',
+    'DROP TRIGGER IF EXISTS reconnect_message_fts_ad',
+    'DROP TRIGGER IF EXISTS reconnect_message_fts_ai',
+    'DROP TABLE IF EXISTS reconnect_message_fts',
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite-only; other backends simply have no message search.
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reconnect', '0015_participant_read_pointer'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
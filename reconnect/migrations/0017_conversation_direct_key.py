@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:48
+
+from django.db import migrations, models
+
+
+def backfill_direct_key(apps, schema_editor):
+    Conversation = apps.get_model('reconnect', 'Conversation')
+    ConversationParticipant = apps.get_model('reconnect', 'ConversationParticipant')
+    members = {}
+    for convo_id, user_id in ConversationParticipant.objects.filter(
+        conversation__is_group=False,
+    ).values_list('conversation_id', 'user_id').iterator():
+        members.setdefault(convo_id, set()).add(user_id)
+
+    taken = set()
+    # Oldest first: if a pair already has duplicate chats, the first one keeps
+    # the key and the rest stay reachable from the inbox as before.
+    for convo_id in Conversation.objects.filter(is_group=False).order_by('created_at').values_list('id', flat=True):
+        user_ids = members.get(convo_id, ())
+        if len(user_ids) != 2:
+            continue
+        low, high = sorted(user_ids)
+        key = f'{low}:{high}'
+        if key in taken:
+            continue
+        taken.add(key)
+        Conversation.objects.filter(id=convo_id).update(direct_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reconnect', '0016_message_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='direct_key',
+            field=models.CharField(blank=True, editable=False, max_length=41, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_direct_key, migrations.RunPython.noop),
+    ]
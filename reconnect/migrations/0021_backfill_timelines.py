@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:06
+
+from django.db import migrations
+from django.db.models import Q
+
+# Mirrors settings.TIMELINE_MAX_LENGTH at the time of writing
+TIMELINE_MAX_LENGTH = 500
+
+
+def backfill_timelines(apps, schema_editor):
+    """
+    Give every user with an empty home timeline the one timeline.rebuild()
+    would, so nobody depends on running rebuild_timelines by hand after 0008.
+    """
+    CustomUser = apps.get_model('reconnect', 'CustomUser')
+    Connection = apps.get_model('reconnect', 'Connection')
+    Post = apps.get_model('reconnect', 'Post')
+    TimelineEntry = apps.get_model('reconnect', 'TimelineEntry')
+
+    has_timeline = set(TimelineEntry.objects.values_list('user_id', flat=True).distinct())
+    for user_id in CustomUser.objects.order_by('id').values_list('id', flat=True).iterator():
+        if user_id in has_timeline:
+            continue
+        peers = Connection.objects.filter(
+            Q(from_user_id=user_id) | Q(to_user_id=user_id), status='accepted',
+        ).values_list('from_user_id', 'to_user_id')
+        authors = sorted({user_id} | {uid for pair in peers for uid in pair})
+        latest = []
+        for i in range(0, len(authors), 500):
+            latest += Post.objects.filter(
+                Q(fanout_on_read=False) | Q(author_id=user_id), author_id__in=authors[i:i + 500], is_active=True,
+            ).order_by('-created_at', '-id').values_list('id', 'created_at')[:TIMELINE_MAX_LENGTH]
+        latest.sort(key=lambda row: (row[1], row[0]), reverse=True)
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=pid, created_at=ts) for pid, ts in latest[:TIMELINE_MAX_LENGTH]],
+            ignore_conflicts=True,
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reconnect', '0020_social_graph_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
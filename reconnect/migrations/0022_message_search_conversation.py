@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:08
+
+from importlib import import_module
+
+from django.db import migrations
+
+# Rebuild the FTS5 index with the message's conversation as a second column,
+# so a search MATCHes only the caller's conversations before anything is
+# ranked.  Its weight in bm25 is zero: it filters, it does not score.
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS reconnect_message_fts_au',
+    'DROP TRIGGER IF EXISTS reconnect_message_fts_ad',
+    'DROP TRIGGER IF EXISTS reconnect_message_fts_ai',
+    'DROP TABLE IF EXISTS reconnect_message_fts',
+]
+
+CREATE_SQL = DROP_SQL + [
+    """
+    CREATE VIRTUAL TABLE reconnect_message_fts USING fts5(
+        content,
+        conversation_id,
+        content='reconnect_message',
+        content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    "INSERT INTO reconnect_message_fts(reconnect_message_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+    """
+    CREATE TRIGGER reconnect_message_fts_ai AFTER INSERT ON reconnect_message BEGIN
+        INSERT INTO reconnect_message_fts(rowid, content, conversation_id)
+        VALUES (new.rowid, new.content, new.conversation_id);
+    END
+    """,
+    """
+    CREATE TRIGGER reconnect_message_fts_ad AFTER DELETE ON reconnect_message BEGIN
+        INSERT INTO reconnect_message_fts(reconnect_message_fts, rowid, content, conversation_id)
+        VALUES ('delete', old.rowid, old.content, old.conversation_id);
+    END
+    """,
+    """
+    CREATE TRIGGER reconnect_message_fts_au AFTER UPDATE OF content, conversation_id ON reconnect_message BEGIN
+        INSERT INTO reconnect_message_fts(reconnect_message_fts, rowid, content, conversation_id)
+        VALUES ('delete', old.rowid, old.content, old.conversation_id);
+        INSERT INTO reconnect_message_fts(rowid, content, conversation_id)
+        VALUES (new.rowid, new.content, new.conversation_id);
+    END
+    """,
+    "INSERT INTO reconnect_message_fts(reconnect_message_fts) VALUES ('rebuild')",
+]
+
+# Back to the content-only index of 0016
+RESTORE_SQL = DROP_SQL + import_module('reconnect.migrations.0016_message_search').CREATE_SQL
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reconnect', '0021_backfill_timelines'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(RESTORE_SQL)),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reconnect', '0022_message_search_conversation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SocialGraphChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(unique=True)),
+                ('user_id', models.BigIntegerField()),
+                ('other_id', models.BigIntegerField()),
+                ('connected', models.BooleanField()),
+            ],
+        ),
+    ]
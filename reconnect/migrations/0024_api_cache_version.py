@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reconnect', '0023_social_graph_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiCacheVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.CharField(max_length=50, unique=True)),
+                ('stamp', models.PositiveBigIntegerField()),
+            ],
+        ),
+    ]
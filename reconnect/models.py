@@ -1,7 +1,11 @@
-import uuid
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
+
+from reconnect.ids import uuid7
 
 
 class CustomUser(AbstractUser):
@@ -29,6 +33,8 @@ class CustomUser(AbstractUser):
     date_of_birth = models.DateField(null=True, blank=True)
     register_number = models.CharField(max_length=50, blank=True, default='')
     profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
+    # Storage names of resized copies, see reconnect.images.AVATAR_VARIANTS
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
 
     USERNAME_FIELD = "enrollment_number"
     REQUIRED_FIELDS = ["username"]
@@ -41,13 +47,28 @@ class CustomUser(AbstractUser):
         last = self.last_name[:1].upper() if self.last_name else ''
         return first + last or self.enrollment_number[:2].upper()
 
+    def avatar_url(self, variant='md'):
+        """URL of a resized profile picture, falling back to the original upload."""
+        if not self.profile_picture:
+            return ''
+        name = self.profile_picture_variants.get(variant)
+        return self.profile_picture.storage.url(name) if name else self.profile_picture.url
+
+    def avatar_urls(self):
+        if not self.profile_picture:
+            return {}
+        return {'original': self.profile_picture.url, 'sm': self.avatar_url('sm'), 'md': self.avatar_url('md')}
+
 
 # ─── Chat Models ─────────────────────────────────────────────────────────────
 
 class Conversation(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=200, blank=True, default='')
     is_group = models.BooleanField(default=False)
+    # "<lower user id>:<higher user id>" for 1-on-1 chats, NULL for groups.
+    # Unique, so there is at most one direct conversation per pair.
+    direct_key = models.CharField(max_length=41, null=True, blank=True, unique=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -61,37 +82,73 @@ class Conversation(models.Model):
         related_name='conversations',
     )
 
+    # Denormalized from the newest message by reconnect.chat.record_message
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=100, blank=True, default='')
+    last_sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+',
+    )
+
     class Meta:
         ordering = ['-created_at']
 
+    @staticmethod
+    def pair_key(user_id, other_id):
+        low, high = sorted((int(user_id), int(other_id)))
+        return f'{low}:{high}'
+
     def __str__(self):
         return self.name or f"Chat {self.id}"
 
     def last_message(self):
-        return self.messages.order_by('-timestamp').first()
+        return self.messages.order_by('-id').first()
 
 
 class ConversationParticipant(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='membership')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_memberships')
     joined_at = models.DateTimeField(auto_now_add=True)
+    # Copy of conversation.last_message_at so the inbox is a single index scan
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    # Read pointer; only ever moves forward (reconnect.chat.mark_read).  No DB
+    # constraint, so it may point at a write-behind message not yet flushed.
+    last_read_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        db_constraint=False,
+        related_name='+',
+    )
+    last_read_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         unique_together = ('conversation', 'user')
+        indexes = [
+            models.Index(fields=['user', 'last_message_at'], name='participant_inbox_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} in {self.conversation}"
 
 
 class Message(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sent_messages')
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set by default rather than auto_now_add so write-behind rows keep the
+    # time they were broadcast with.
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
-        ordering = ['timestamp']
+        # ids are UUIDv7, so id order is send order
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['conversation', 'id'], name='message_history_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sender} @ {self.timestamp:%H:%M}: {self.content[:30]}"
@@ -193,6 +250,8 @@ class Post(models.Model):
     title = models.CharField(max_length=300, blank=True, default='')
     body = models.TextField(blank=True, default='')
     image = models.ImageField(upload_to='post_images/', null=True, blank=True)
+    # Storage names of resized copies, see reconnect.images.POST_IMAGE_VARIANTS
+    image_variants = models.JSONField(default=dict, blank=True)
 
     # Hiring-specific fields
     company = models.CharField(max_length=200, blank=True, default='')
@@ -211,21 +270,73 @@ class Post(models.Model):
     # Open-for fields (comma-separated tags)
     open_for_tags = models.CharField(max_length=500, blank=True, default='')
 
+    # Denormalized counters, kept in step by toggle_like / add_comment.
+    # Run `manage.py recount_post_counters` to repair any drift.
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+
+    # Set when the author had too many connections to fan the post out on
+    # write; such posts are merged into home timelines at read time instead.
+    fanout_on_read = models.BooleanField(default=False)
+
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination for the global feed and per-author profile feeds
+            models.Index(fields=['is_active', 'created_at', 'id'], name='post_feed_idx'),
+            models.Index(fields=['author', 'is_active', 'created_at', 'id'], name='post_author_feed_idx'),
+            models.Index(
+                fields=['author', 'created_at', 'id'], name='post_fanout_on_read_idx',
+                condition=models.Q(fanout_on_read=True),
+            ),
+        ]
 
     def __str__(self):
         return f"[{self.post_type}] {self.title or self.body[:50]} by {self.author}"
 
+    def image_url(self, variant='feed'):
+        """URL of a resized post image, falling back to the original upload."""
+        if not self.image:
+            return ''
+        name = self.image_variants.get(variant)
+        return self.image.storage.url(name) if name else self.image.url
+
+    def image_urls(self):
+        if not self.image:
+            return {}
+        return {'original': self.image.url, 'feed': self.image_url('feed'), 'thumb': self.image_url('thumb')}
+
     def like_count(self):
         return self.likes.count()
 
     def comment_count(self):
         return self.comments.count()
 
+    @staticmethod
+    def counter_expressions():
+        """Correlated subqueries that compute the true like / comment counts."""
+        return {
+            'likes_count': Coalesce(Subquery(
+                PostLike.objects.filter(post=OuterRef('pk'))
+                .values('post').annotate(n=Count('id')).values('n')
+            ), 0),
+            'comments_count': Coalesce(Subquery(
+                PostComment.objects.filter(post=OuterRef('pk'))
+                .values('post').annotate(n=Count('id')).values('n')
+            ), 0),
+        }
+
+    @classmethod
+    def recount(cls, post_ids=None):
+        """Rewrite the denormalized counters from the like / comment tables."""
+        qs = cls.objects.all()
+        if post_ids is not None:
+            qs = qs.filter(id__in=post_ids)
+        return qs.update(**cls.counter_expressions())
+
 
 class PostLike(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
@@ -244,11 +355,31 @@ class PostComment(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} on {self.post}: {self.content[:30]}"
 
 
+class TimelineEntry(models.Model):
+    """A post materialized into one user's home timeline (see reconnect.timeline)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    # Copy of post.created_at so timeline pages never have to scan Post
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'post'], name='timeline_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} in {self.user}'s timeline"
+
+
 # ─── Connection / Networking Models ──────────────────────────────────────────
 
 class Connection(models.Model):
@@ -269,11 +400,74 @@ class Connection(models.Model):
 
     class Meta:
         unique_together = ('from_user', 'to_user')
+        indexes = [
+            # unique_together covers (from_user, to_user); this serves lookups
+            # keyed on the recipient, i.e. the other direction of a pair.
+            models.Index(fields=['to_user', 'from_user'], name='connection_reverse_idx'),
+        ]
 
     def __str__(self):
         return f"{self.from_user} → {self.to_user} ({self.status})"
 
 
+class SocialGraphVersion(models.Model):
+    """
+    Single row bumped in the same transaction as every change to the
+    accepted-connection graph, so each process can tell whether its
+    in-memory copy (reconnect.graph) is current.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"social graph v{self.version}"
+
+
+class SocialGraphChange(models.Model):
+    """
+    One pair becoming connected or unconnected, logged under the
+    SocialGraphVersion it bumped to.  Other processes replay these instead
+    of reloading the whole graph (reconnect.graph).
+    """
+    version = models.PositiveBigIntegerField(unique=True)
+    # Plain ids: the log outlives the users it mentions
+    user_id = models.BigIntegerField()
+    other_id = models.BigIntegerField()
+    connected = models.BooleanField()
+
+    def __str__(self):
+        return f"v{self.version}: {self.user_id} {'+' if self.connected else '-'} {self.other_id}"
+
+
+class ApiCacheVersion(models.Model):
+    """
+    Version stamp of one reconnect.api_cache namespace, kept here when the
+    'api' cache is process-local so that every worker sees each bump.
+    """
+    namespace = models.CharField(max_length=50, unique=True)
+    stamp = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return f"{self.namespace} @ {self.stamp}"
+
+
+class PeopleRecommendation(models.Model):
+    """One ranked "people you may know" suggestion (see reconnect.recommendations)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='recommendations')
+    candidate = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    mutual_count = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'candidate')
+        indexes = [
+            models.Index(fields=['user', '-score', 'candidate'], name='recommendation_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.candidate_id} for {self.user} ({self.score:.2f})"
+
+
 # ─── Opportunity Model ───────────────────────────────────────────────────────
 
 class Opportunity(models.Model):
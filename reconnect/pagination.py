@@ -0,0 +1,87 @@
+"""
+Keyset (cursor) pagination for the JSON APIs.
+
+Cursors are opaque, URL-safe tokens wrapping the ``(created_at, id)`` of the
+last row on a page.  Seeking from a cursor is an index range scan, so page N
+costs the same as page 1.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_key(*values):
+    """Opaque token for an arbitrary sort key of JSON-serialisable values."""
+    raw = json.dumps(list(values), separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_key(token, types):
+    """Inverse of :func:`encode_key`, converting each value with ``types``."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(values) != len(types):
+            raise ValueError(token)
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
+
+
+def encode_cursor(created_at, pk):
+    return encode_key(created_at.isoformat(), pk)
+
+
+def decode_cursor(token):
+    return decode_key(token, (datetime.fromisoformat, int))
+
+
+def parse_limit(request, default, maximum):
+    """Read ``?limit=`` clamped to ``1..maximum``."""
+    try:
+        limit = int(request.GET.get('limit', default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, maximum))
+
+
+def seek(qs, cursor, descending=True, tiebreak='id'):
+    """
+    Order ``qs`` by ``(created_at, <tiebreak>)`` and, if ``cursor`` is given,
+    restrict it to the rows after that cursor.  Raises :class:`InvalidCursor`
+    for a malformed token.
+    """
+    if descending:
+        qs = qs.order_by('-created_at', f'-{tiebreak}')
+    else:
+        qs = qs.order_by('created_at', tiebreak)
+
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        # `created_at <= X` bounds the index range; the OR only breaks ties.
+        if descending:
+            qs = qs.filter(Q(created_at__lte=created_at) & (
+                Q(created_at__lt=created_at) | Q(**{f'{tiebreak}__lt': pk})))
+        else:
+            qs = qs.filter(Q(created_at__gte=created_at) & (
+                Q(created_at__gt=created_at) | Q(**{f'{tiebreak}__gt': pk})))
+    return qs
+
+
+def paginate(qs, cursor, limit, descending=True):
+    """
+    Return ``(rows, next_cursor)`` for one page of ``qs`` ordered by
+    ``(created_at, id)``.  ``next_cursor`` is ``None`` on the last page.
+    """
+    rows = list(seek(qs, cursor, descending)[:limit + 1])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, encode_cursor(last.created_at, last.id)
+    return rows, None
@@ -0,0 +1,72 @@
+"""
+Ephemeral presence and typing state for chat sockets.
+
+Nothing here touches the database.  State lives in the 'default' cache with
+TTLs: each open socket keeps its user's entry alive with a heartbeat, so a
+crashed worker's users simply age out to offline.  Point the cache at a
+shared backend (Redis / Memcached) when running more than one process.
+
+Typing indicators are coalesced through ``cache.add``: the first keystroke
+in a TYPING_INTERVAL window claims the slot and is broadcast, the rest of
+the window is dropped -- across every worker, not just per socket.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+PRESENCE_TTL = getattr(settings, 'PRESENCE_TTL', 60)
+TYPING_INTERVAL = getattr(settings, 'TYPING_INTERVAL', 3)
+
+HEARTBEAT_INTERVAL = PRESENCE_TTL / 2
+STATUSES = ('online', 'away')
+
+
+def _status_key(user_id):
+    return f'presence:{user_id}'
+
+
+def _sockets_key(user_id):
+    return f'presence:sockets:{user_id}'
+
+
+# ─── Sockets (async, called from consumers) ──────────────────────────────────
+
+async def connected(user_id):
+    await cache.aadd(_sockets_key(user_id), 0, PRESENCE_TTL)
+    await cache.aincr(_sockets_key(user_id))
+    await cache.aset(_status_key(user_id), 'online', PRESENCE_TTL)
+
+
+async def disconnected(user_id):
+    try:
+        remaining = await cache.adecr(_sockets_key(user_id))
+    except ValueError:
+        remaining = 0
+    if remaining <= 0:
+        await cache.adelete_many([_sockets_key(user_id), _status_key(user_id)])
+
+
+async def heartbeat(user_id):
+    """Keep ``user_id`` from expiring while one of their sockets is open."""
+    if not await cache.atouch(_status_key(user_id), PRESENCE_TTL):
+        # Expired under us (e.g. cache eviction); come back as online
+        await cache.aset(_status_key(user_id), 'online', PRESENCE_TTL)
+    await cache.atouch(_sockets_key(user_id), PRESENCE_TTL)
+
+
+async def set_status(user_id, status):
+    if status in STATUSES:
+        await cache.aset(_status_key(user_id), status, PRESENCE_TTL)
+
+
+async def claim_typing(conversation_id, user_id):
+    """True if this keystroke should be broadcast, False if coalesced away."""
+    return await cache.aadd(f'typing:{conversation_id}:{user_id}', 1, TYPING_INTERVAL)
+
+
+# ─── Queries ─────────────────────────────────────────────────────────────────
+
+def statuses(user_ids):
+    """``{user_id: 'online' | 'away' | 'offline'}`` in one cache round-trip."""
+    keys = {_status_key(uid): uid for uid in user_ids}
+    found = cache.get_many(keys)
+    return {uid: found.get(key, 'offline') for key, uid in keys.items()}
@@ -0,0 +1,232 @@
+"""
+"People you may know" suggestions.
+
+Candidates for a user are scored as
+
+    mutual * log(1 + mutual connections)
+    + department     if both are in the same department
+    + year           if their passed_out_years are at most one apart
+    + working_status if both list the same working status
+
+with the weights in ``RECOMMENDATION_WEIGHTS``.  The top
+``RECOMMENDATIONS_PER_USER`` of each role are stored in PeopleRecommendation
+and served from there, so a ``?role=`` filter still finds a full list.
+
+Scoring never compares every pair of users.  Profiles are loaded once per
+run and bucketed by department, role and then (year, working_status), so the
+attribute part of the score is the same for a whole bucket: a user's
+attribute-only candidates of each role come from walking that role's buckets
+in their department best first until enough are collected.  Candidates with
+mutual connections come from the in-memory social graph (reconnect.graph).  A full run is then
+proportional to users x roles x RECOMMENDATIONS_PER_USER, and is written in
+batches.
+
+Accepting or requesting a connection drops the suggestion for that pair
+straight away (reconnect.signals); ``manage.py recommend_people --stale``
+recomputes lists that have aged.
+"""
+import heapq
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from reconnect.graph import graph
+from reconnect.models import Connection, CustomUser, PeopleRecommendation
+from reconnect.pagination import decode_key, encode_key
+
+WEIGHTS = {
+    'mutual': 2.0,
+    'department': 2.0,
+    'year': 1.0,
+    'working_status': 0.5,
+    **getattr(settings, 'RECOMMENDATION_WEIGHTS', {}),
+}
+PER_USER = getattr(settings, 'RECOMMENDATIONS_PER_USER', 100)
+BATCH_SIZE = 500
+
+
+def _affinity(profile, other):
+    """Attribute part of the score; ``profile`` is (department, year, working_status)."""
+    department, year, status = profile
+    other_department, other_year, other_status = other
+    score = 0.0
+    if department and department == other_department:
+        score += WEIGHTS['department']
+    if year is not None and other_year is not None and abs(year - other_year) <= 1:
+        score += WEIGHTS['year']
+    if status and status.casefold() == (other_status or '').casefold():
+        score += WEIGHTS['working_status']
+    return score
+
+
+def _best_first(item):
+    candidate_id, score = item
+    return -score, candidate_id
+
+
+class Scorer:
+    """Scores candidates against one snapshot of user profiles."""
+
+    def __init__(self, profiles, roles, requested):
+        # {user_id: (department, year, working_status)}
+        self.profiles = profiles
+        # {user_id: role}
+        self.roles = roles
+        # {user_id: ids with a pending / declined request either way}
+        self.requested = requested
+        # {department: {role: {(year, working_status): [user_id, best connected first]}}}
+        self.buckets = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        for user_id, (department, year, status) in profiles.items():
+            if department:
+                self.buckets[department][roles[user_id]][(year, status)].append(user_id)
+        for by_role in self.buckets.values():
+            for by_key in by_role.values():
+                for ids in by_key.values():
+                    ids.sort(key=lambda uid: (-graph.degree(uid), uid))
+
+    @classmethod
+    def load(cls, user_ids=None):
+        """
+        Snapshot of every active non-admin user, or -- for ``user_ids`` --
+        just the departments and friends-of-friends those users can be
+        matched with.
+        """
+        users = CustomUser.objects.filter(is_active=True).exclude(role='admin')
+        requests = Connection.objects.exclude(status='accepted')
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            departments = set(users.filter(id__in=user_ids).exclude(department='').values_list('department', flat=True))
+            nearby = {uid for user_id in user_ids for uid, _ in graph.second_degree(user_id)}
+            users = users.filter(Q(department__in=departments) | Q(id__in=[*user_ids, *nearby]))
+            requests = requests.filter(Q(from_user_id__in=user_ids) | Q(to_user_id__in=user_ids))
+
+        profiles, roles = {}, {}
+        for uid, role, department, year, status in users.values_list(
+            'id', 'role', 'department', 'passed_out_year', 'working_status',
+        ).iterator(chunk_size=5000):
+            profiles[uid] = (department, year, status)
+            roles[uid] = role
+        requested = defaultdict(set)
+        for from_id, to_id in requests.values_list('from_user_id', 'to_user_id').iterator(chunk_size=5000):
+            requested[from_id].add(to_id)
+            requested[to_id].add(from_id)
+        return cls(profiles, roles, requested)
+
+    def top(self, user_id, limit=PER_USER):
+        """``[(candidate_id, score, mutual_count)]``: the best ``limit`` of each role, best first."""
+        profile = self.profiles.get(user_id)
+        if profile is None:
+            return []
+        skip = {user_id, *graph.peers(user_id), *self.requested.get(user_id, ())}
+
+        scores, mutuals = {}, {}
+        for candidate_id, mutual in graph.second_degree(user_id):
+            other = self.profiles.get(candidate_id)
+            if other is None or candidate_id in skip:
+                continue
+            mutuals[candidate_id] = mutual
+            scores[candidate_id] = WEIGHTS['mutual'] * math.log1p(mutual) + _affinity(profile, other)
+
+        # Strangers from the same department, most similar buckets first,
+        # up to ``limit`` of each role
+        department = profile[0]
+        for by_key in self.buckets.get(department, {}).values():
+            ranked = sorted(
+                ((_affinity(profile, (department, *key)), ids) for key, ids in by_key.items()),
+                key=lambda pair: -pair[0],
+            )
+            wanted = limit
+            for score, ids in ranked:
+                for candidate_id in ids:
+                    if candidate_id in skip or candidate_id in scores:
+                        continue
+                    scores[candidate_id] = score
+                    wanted -= 1
+                    if not wanted:
+                        break
+                if not wanted:
+                    break
+
+        by_role = defaultdict(list)
+        for item in scores.items():
+            by_role[self.roles[item[0]]].append(item)
+        best = sorted(
+            (item for items in by_role.values() for item in heapq.nsmallest(limit, items, key=_best_first)),
+            key=_best_first,
+        )
+        return [(candidate_id, score, mutuals.get(candidate_id, 0)) for candidate_id, score in best if score > 0]
+
+    def store(self, user_ids):
+        """Replace the stored suggestions of ``user_ids``."""
+        now = timezone.now()
+        rows = [
+            PeopleRecommendation(user_id=user_id, candidate_id=candidate_id, score=score,
+                                 mutual_count=mutual, computed_at=now)
+            for user_id in user_ids
+            for candidate_id, score, mutual in self.top(user_id)
+        ]
+        with transaction.atomic():
+            PeopleRecommendation.objects.filter(user_id__in=user_ids).delete()
+            PeopleRecommendation.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        return len(rows)
+
+
+def rebuild_all():
+    """Recompute everyone's suggestions.  Returns ``(users, rows)`` written."""
+    scorer = Scorer.load()
+    user_ids = sorted(scorer.profiles)
+    written = 0
+    for i in range(0, len(user_ids), BATCH_SIZE):
+        written += scorer.store(user_ids[i:i + BATCH_SIZE])
+    return len(user_ids), written
+
+
+def refresh(user_ids):
+    """Recompute the suggestions of just ``user_ids``."""
+    user_ids = list(user_ids)
+    written = 0
+    for i in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[i:i + BATCH_SIZE]
+        written += Scorer.load(batch).store(batch)
+    return written
+
+
+def stale_user_ids(older_than):
+    """Active users whose suggestions were computed before ``older_than`` (or never)."""
+    return CustomUser.objects.filter(is_active=True).exclude(role='admin').annotate(
+        computed_at=Max('recommendations__computed_at'),
+    ).filter(Q(computed_at__isnull=True) | Q(computed_at__lt=older_than)).values_list('id', flat=True)
+
+
+def forget_pair(user_id, other_id):
+    """Stop suggesting two people to each other, e.g. once one asked to connect."""
+    PeopleRecommendation.objects.filter(
+        Q(user_id=user_id, candidate_id=other_id) | Q(user_id=other_id, candidate_id=user_id)
+    ).delete()
+
+
+def page(user_id, role=None, cursor=None, limit=20):
+    """
+    Return ``(recommendations, next_cursor)`` for ``user_id``, best first,
+    computing the list on the spot if there is none yet.  Raises
+    :class:`InvalidCursor` for a malformed cursor.
+    """
+    qs = PeopleRecommendation.objects.filter(user_id=user_id)
+    if not qs.exists():
+        refresh([user_id])
+    if role:
+        qs = qs.filter(candidate__role=role)
+    if cursor:
+        score, candidate_id = decode_key(cursor, (float, int))
+        qs = qs.filter(Q(score__lt=score) | Q(score=score, candidate_id__gt=candidate_id))
+
+    rows = list(qs.select_related('candidate').order_by('-score', 'candidate_id')[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_key(rows[-1].score, rows[-1].candidate_id)
+    return rows, next_cursor
@@ -3,4 +3,6 @@ from reconnect import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/chat/(?P<conversation_id>[0-9a-f\-]+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/inbox/$', consumers.InboxConsumer.as_asgi()),
+    re_path(r'ws/feed/$', consumers.FeedConsumer.as_asgi()),
 ]
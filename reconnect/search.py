@@ -0,0 +1,185 @@
+"""
+Full-text search over chat messages (SQLite FTS5).
+
+``reconnect_message_fts`` is an external-content FTS5 index over
+``reconnect_message.content`` and ``conversation_id``: it stores only the
+inverted index, and triggers (migrations 0016, 0022) keep it in step with
+every insert, update and delete -- including bulk_create from the chat
+write-behind buffer.  Rows are tied together by the message table's rowid,
+which VACUUM may renumber; run ``manage.py rebuild_message_search``
+afterwards.  A migration that makes Django rebuild ``reconnect_message``
+renumbers them too and drops the triggers: :func:`repair` runs after every
+``migrate`` to put the triggers back and re-index.  Hits are also checked
+against the caller's conversations on the message row itself, so a stale
+index entry can never surface someone else's message.
+
+A search MATCHes the words in ``content`` and the caller's conversations in
+``conversation_id`` together, so FTS5 only ever ranks messages the caller
+may see.  The conversation column has weight 0 in bm25.  Results are paged
+with an opaque ``(rank, id)`` cursor.
+"""
+import html
+import re
+import uuid
+
+from django.db import connection, connections
+
+from reconnect.models import ConversationParticipant, Message
+from reconnect.pagination import decode_key, encode_key
+
+FTS_TABLE = 'reconnect_message_fts'
+SNIPPET_TOKENS = 12
+
+# Kept in step with migration 0022
+TRIGGERS_SQL = {
+    'reconnect_message_fts_ai': """
+        CREATE TRIGGER reconnect_message_fts_ai AFTER INSERT ON reconnect_message BEGIN
+            INSERT INTO reconnect_message_fts(rowid, content, conversation_id)
+            VALUES (new.rowid, new.content, new.conversation_id);
+        END
+    """,
+    'reconnect_message_fts_ad': """
+        CREATE TRIGGER reconnect_message_fts_ad AFTER DELETE ON reconnect_message BEGIN
+            INSERT INTO reconnect_message_fts(reconnect_message_fts, rowid, content, conversation_id)
+            VALUES ('delete', old.rowid, old.content, old.conversation_id);
+        END
+    """,
+    'reconnect_message_fts_au': """
+        CREATE TRIGGER reconnect_message_fts_au AFTER UPDATE OF content, conversation_id ON reconnect_message BEGIN
+            INSERT INTO reconnect_message_fts(reconnect_message_fts, rowid, content, conversation_id)
+            VALUES ('delete', old.rowid, old.content, old.conversation_id);
+            INSERT INTO reconnect_message_fts(rowid, content, conversation_id)
+            VALUES (new.rowid, new.content, new.conversation_id);
+        END
+    """,
+}
+
+# Private-use sentinels so highlighting survives HTML escaping
+_OPEN, _CLOSE = '\ue000', '\ue001'
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchUnavailable(Exception):
+    pass
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def to_match(query):
+    """
+    Turn free text into a safe FTS5 expression: every word must match, the
+    last one as a prefix (search-as-you-type).  Returns '' if nothing is left.
+    """
+    terms = _TERM.findall(query)
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _highlight(snippet):
+    return html.escape(snippet).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+
+
+def search_messages(user_id, query, conversation_id=None, cursor=None, limit=20):
+    """
+    Return ``(hits, next_cursor)`` for messages in ``user_id``'s conversations
+    matching ``query``, best first.  Each hit is ``(message, snippet)``, the
+    snippet being HTML-safe with matches wrapped in ``<mark>``.  Raises
+    :class:`InvalidCursor` for a malformed cursor.
+    """
+    if not available():
+        raise SearchUnavailable(connection.vendor)
+    match = to_match(query)
+    if not match:
+        return [], None
+
+    conversations = ConversationParticipant.objects.filter(user_id=user_id)
+    if conversation_id is not None:
+        conversations = conversations.filter(conversation_id=conversation_id)
+    conversation_ids = list(conversations.values_list('conversation_id', flat=True))
+    if not conversation_ids:
+        return [], None
+    scoped = ' OR '.join(f'"{cid.hex}"' for cid in conversation_ids)
+    match = f'content : ({match}) AND conversation_id : ({scoped})'
+
+    scope = ','.join(['%s'] * len(conversation_ids))
+    params = [match, *[cid.hex for cid in conversation_ids]]
+    where = ''
+    if cursor:
+        rank, last_id = decode_key(cursor, (float, str))
+        where += ' AND (hits.rank > %s OR (hits.rank = %s AND m.id > %s))'
+        params += [rank, rank, last_id]
+    params.append(limit + 1)
+
+    with connection.cursor() as c:
+        c.execute(f'''
+            SELECT m.rowid, m.id, hits.rank
+            FROM (SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s) hits
+            JOIN reconnect_message m ON m.rowid = hits.rowid
+            WHERE m.conversation_id IN ({scope}){where}
+            ORDER BY hits.rank, m.id
+            LIMIT %s
+        ''', params)
+        rows = c.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_key(rows[-1][2], rows[-1][1])
+        if not rows:
+            return [], None
+
+        # Snippets only for the page being returned
+        marks = ','.join(['%s'] * len(rows))
+        c.execute(f'''
+            SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, '…', %s)
+            FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({marks})
+        ''', [_OPEN, _CLOSE, SNIPPET_TOKENS, match, *[row[0] for row in rows]])
+        snippets = dict(c.fetchall())
+
+    messages = Message.objects.select_related('sender').in_bulk([uuid.UUID(row[1]) for row in rows])
+    return [
+        (messages[uuid.UUID(message_id)], _highlight(snippets.get(rowid, '')))
+        for rowid, message_id, _ in rows if uuid.UUID(message_id) in messages
+    ], next_cursor
+
+
+def rebuild():
+    """Re-index every message from scratch."""
+    if not available():
+        raise SearchUnavailable(connection.vendor)
+    with connection.cursor() as c:
+        c.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        c.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def repair(using='default'):
+    """
+    Recreate any missing index trigger and re-index, e.g. after a migration
+    rebuilt ``reconnect_message``.  Does nothing until migration 0022 has
+    created the index.  Returns whether anything was repaired.
+    """
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return False
+    with conn.cursor() as c:
+        c.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE],
+        )
+        row = c.fetchone()
+        if row is None or 'conversation_id' not in row[0]:
+            return False
+        c.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'reconnect_message'",
+        )
+        missing = set(TRIGGERS_SQL).difference(name for name, in c.fetchall())
+        if not missing:
+            return False
+        for name in sorted(missing):
+            c.execute(TRIGGERS_SQL[name])
+        c.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
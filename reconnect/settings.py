@@ -76,10 +76,57 @@ TEMPLATES = [
 WSGI_APPLICATION = 'reconnect.wsgi.application'
 ASGI_APPLICATION = 'reconnect.asgi.application'
 
+# Shared by every worker process on the host (see reconnect/layers.py), so
+# chat groups work with more than one Daphne process.  Tests can swap in
+# 'reconnect.layers.MemoryBroker'.
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'BACKEND': 'reconnect.layers.BrokeredChannelLayer',
+        'CONFIG': {
+            'broker': 'reconnect.layers.SQLiteBroker',
+            'broker_options': {'location': BASE_DIR / 'channel_layer', 'shards': 4},
+            'expiry': 60,
+            'capacity': 100,
+        },
+    },
+}
+
+# Seconds reconnect.live_feed collects feed deltas (latest per post) before
+# publishing them as one batch to the 'feed' group
+FEED_COALESCE_WINDOW = 1.0
+
+
+# Caches
+# 'api' holds rendered JSON bodies for reconnect/api_cache.py.  Point both
+# aliases at a shared backend (Redis / Memcached) when running more than one
+# worker process, so invalidations are seen everywhere.  While 'api' is a
+# LocMemCache its version stamps live in the database (ApiCacheVersion) and
+# each process holds them for API_CACHE_STAMP_TTL seconds, so a write on one
+# worker reaches the others' bodies and ETags within that time.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     },
+    'api': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-responses',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+API_CACHE_STAMP_TTL = 1
+
+# Per-namespace TTLs (seconds) for cached API responses
+API_CACHE_TTLS = {
+    'events': 300,
+    'announcements': 300,
+    'opportunities': 120,
+    'projects': 120,
 }
 
 
@@ -139,3 +186,69 @@ AUTH_USER_MODEL = 'reconnect.CustomUser'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = 'login'
+
+
+# Home timelines (reconnect/timeline.py)
+# Each user's materialized timeline keeps at most TIMELINE_MAX_LENGTH posts,
+# trimmed when its owner opens it and by `manage.py trim_timelines` (schedule
+# it, e.g. hourly, for users who rarely read).
+# Authors with more accepted connections than TIMELINE_FANOUT_LIMIT are not
+# fanned out on write; their posts are merged in when a timeline is read.
+
+TIMELINE_MAX_LENGTH = 500
+TIMELINE_FANOUT_LIMIT = 1000
+
+
+# Post likes (reconnect/likes.py)
+# With LIKE_WRITE_BEHIND on, toggle_like only buffers the intent; buffered
+# likes are written in bulk once LIKE_FLUSH_BATCH are pending, or at most
+# LIKE_FLUSH_INTERVAL seconds after the first one.
+
+LIKE_WRITE_BEHIND = False
+LIKE_FLUSH_INTERVAL = 2.0
+LIKE_FLUSH_BATCH = 500
+
+# Chat persistence (reconnect/chat.py)
+# With CHAT_WRITE_BEHIND on, ChatConsumer broadcasts messages immediately and
+# persists them in bulk once CHAT_FLUSH_BATCH are queued, or at most
+# CHAT_FLUSH_INTERVAL seconds after the first one; senders get an ack frame
+# once their messages are committed.
+
+CHAT_WRITE_BEHIND = False
+CHAT_FLUSH_INTERVAL = 0.5
+CHAT_FLUSH_BATCH = 200
+
+# ChatConsumer writes a socket's read pointer at most once per this many seconds
+CHAT_READ_COALESCE_WINDOW = 2.0
+
+# A reconnecting chat socket is replayed at most this many missed messages;
+# further behind, it is told to refetch history instead
+CHAT_RESUME_MAX_MESSAGES = 200
+
+# Chat membership checks are cached in the 'default' cache: positive answers
+# for CHAT_MEMBERSHIP_TTL seconds, negative ones for CHAT_MEMBERSHIP_NEGATIVE_TTL.
+# A removed member keeps access on other workers until their cached answer
+# expires, so only raise these with a shared cache (Redis / Memcached); with
+# LocMemCache they are capped at 5 seconds.
+CHAT_MEMBERSHIP_TTL = 5
+CHAT_MEMBERSHIP_NEGATIVE_TTL = 5
+
+# Chat presence / typing (reconnect/presence.py), kept in the 'default' cache
+# only.  Sockets heartbeat every PRESENCE_TTL / 2 seconds; typing indicators
+# are broadcast at most once per TYPING_INTERVAL seconds per user and room.
+PRESENCE_TTL = 60
+TYPING_INTERVAL = 3
+
+# In-memory connection graph (reconnect/graph.py).  Each process checks the
+# version stamp in the database (SocialGraphVersion) at most this often and
+# replays the changes other processes logged since (SocialGraphChange).  The
+# newest SOCIAL_GRAPH_LOG_LENGTH changes are kept; a process further behind
+# reloads the whole graph.
+SOCIAL_GRAPH_CHECK_INTERVAL = 1.0
+SOCIAL_GRAPH_LOG_LENGTH = 10000
+
+# "People you may know" (reconnect/recommendations.py).  Scores add up
+# mutual * log(1 + mutual connections) and flat bonuses for a shared
+# department, passed_out_year within one year and the same working status.
+RECOMMENDATION_WEIGHTS = {'mutual': 2.0, 'department': 2.0, 'year': 1.0, 'working_status': 0.5}
+RECOMMENDATIONS_PER_USER = 100
@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_migrate, post_save
+from django.dispatch import receiver
+
+from reconnect import api_cache, chat, graph, recommendations, search
+from reconnect.models import (
+    Announcement, Connection, ConversationParticipant, CustomUser, Event, Opportunity, Post,
+    Project,
+)
+
+
+# ─── API response cache invalidation ─────────────────────────────────────────
+
+@receiver([post_save, post_delete], sender=Event)
+def _events_changed(sender, **kwargs):
+    api_cache.bump('events')
+
+
+@receiver([post_save, post_delete], sender=Announcement)
+def _announcements_changed(sender, **kwargs):
+    api_cache.bump('announcements')
+
+
+@receiver([post_save, post_delete], sender=Opportunity)
+def _opportunities_changed(sender, **kwargs):
+    api_cache.bump('opportunities')
+
+
+@receiver([post_save, post_delete], sender=Project)
+def _projects_changed(sender, **kwargs):
+    api_cache.bump('projects')
+
+
+@receiver([post_save, post_delete], sender=Post)
+def _posts_changed(sender, **kwargs):
+    api_cache.bump('posts')
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def _users_changed(sender, update_fields=None, **kwargs):
+    # Logins save last_login only; that never shows up in a cached payload.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    api_cache.bump('users')
+
+
+# ─── Chat membership cache ───────────────────────────────────────────────────
+
+@receiver([post_save, post_delete], sender=ConversationParticipant)
+def _membership_changed(sender, instance, **kwargs):
+    # After commit, so a concurrent reader cannot re-cache the old answer.
+    transaction.on_commit(lambda: chat.forget_membership(instance.conversation_id, instance.user_id))
+
+
+# ─── Social graph index ──────────────────────────────────────────────────────
+
+@receiver(post_init, sender=Connection)
+def _connection_loaded(sender, instance, **kwargs):
+    # What the database holds, to tell which saves change an edge
+    instance._saved_status = instance.status if instance.pk else None
+
+
+@receiver(post_save, sender=Connection)
+def _connection_saved(sender, instance, **kwargs):
+    was_accepted = instance._saved_status == 'accepted'
+    instance._saved_status = instance.status
+    _connection_changed(instance, was_accepted, instance.status == 'accepted')
+
+
+@receiver(post_delete, sender=Connection)
+def _connection_deleted(sender, instance, **kwargs):
+    _connection_changed(instance, instance._saved_status == 'accepted', False)
+
+
+def _connection_changed(conn, was_accepted, accepted):
+    if was_accepted == accepted:
+        return  # e.g. a request sent or declined: no edge moved
+    a, b = conn.from_user_id, conn.to_user_id
+    # Either way, the pair stays connected if the request the other way was accepted
+    if Connection.objects.filter(from_user_id=b, to_user_id=a, status='accepted').exists():
+        return
+    # Logged inside the transaction so other workers see it with the change
+    version = graph.record_change(a, b, accepted)
+    update = graph.graph.connect if accepted else graph.graph.disconnect
+    transaction.on_commit(lambda: update(a, b, version))
+
+
+# ─── People recommendations ──────────────────────────────────────────────────
+
+@receiver(post_save, sender=Connection)
+def _connection_requested(sender, instance, **kwargs):
+    # Requested, accepted or declined: either way, no longer a suggestion
+    a, b = instance.from_user_id, instance.to_user_id
+    transaction.on_commit(lambda: recommendations.forget_pair(a, b))
+
+
+# ─── Message search index ────────────────────────────────────────────────────
+
+@receiver(post_migrate)
+def _migrated(sender, using, **kwargs):
+    # A table rebuild drops the FTS triggers and renumbers message rowids
+    if sender.name == 'reconnect':
+        search.repair(using)
@@ -0,0 +1,354 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from reconnect import api_cache, chat, graph, likes, live_feed, recommendations, search, timeline
+from reconnect.models import (
+    ApiCacheVersion, Connection, Conversation, ConversationParticipant, CustomUser, Event, Message, Post,
+    PostLike,
+)
+
+
+def make_user(n, **fields):
+    return CustomUser.objects.create_user(
+        username=f'user{n}', enrollment_number=f'E{n}', password='pw', role='student', **fields,
+    )
+
+
+# ─── Chat write-behind ───────────────────────────────────────────────────────
+
+class MessageBufferTests(TestCase):
+    def setUp(self):
+        self.user = make_user(1)
+        self.buffer = chat.MessageBuffer(flush_interval=60, flush_batch=1000)
+        self.addCleanup(self._stop_timer)
+
+    def _stop_timer(self):
+        if self.buffer._timer is not None:
+            self.buffer._timer.cancel()
+
+    def conversation(self):
+        convo = Conversation.objects.create(created_by=self.user)
+        ConversationParticipant.objects.create(conversation=convo, user=self.user)
+        return convo
+
+    def test_deleted_conversation_does_not_block_the_batch(self):
+        gone, kept = self.conversation(), self.conversation()
+        for convo, text in ((gone, 'a'), (kept, 'b'), (gone, 'c')):
+            self.buffer.add(Message(conversation_id=convo.id, sender=self.user, content=text))
+        gone.delete()
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(Message.objects.values_list('content', flat=True)), ['b'])
+        self.assertEqual(self.buffer.pending(gone.id) + self.buffer.pending(kept.id), [])
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_failed_flush_requeues_and_rearms_timer(self):
+        convo = self.conversation()
+        self.buffer.add(Message(conversation_id=convo.id, sender=self.user, content='hi'))
+        with mock.patch.object(self.buffer, '_write', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+
+        self.assertEqual(len(self.buffer.pending(convo.id)), 1)
+        self.assertIsNotNone(self.buffer._timer)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(Message.objects.count(), 1)
+
+
+class MembershipCacheTests(TestCase):
+    def test_process_local_cache_keeps_answers_briefly(self):
+        # LocMemCache cannot see removals made by other workers
+        self.assertLessEqual(chat.MEMBERSHIP_TTL, chat.LOCAL_CACHE_MAX_TTL)
+        self.assertLessEqual(chat.MEMBERSHIP_NEGATIVE_TTL, chat.LOCAL_CACHE_MAX_TTL)
+
+    def test_removal_revokes_access(self):
+        user = make_user(1)
+        convo = Conversation.objects.create(created_by=user)
+        membership = ConversationParticipant.objects.create(conversation=convo, user=user)
+        self.assertTrue(chat.is_participant(convo.id, user.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            membership.delete()
+        self.assertFalse(chat.is_participant(convo.id, user.id))
+
+
+class RoomGroupTests(TestCase):
+    def test_uppercase_id_publishes_to_the_joined_group(self):
+        user = make_user(1)
+        convo = Conversation.objects.create(created_by=user)
+        ConversationParticipant.objects.create(conversation=convo, user=user)
+        self.client.force_login(user)
+
+        with mock.patch.object(chat.publisher, 'publish', new_callable=mock.AsyncMock) as publish:
+            response = self.client.post(
+                f'/api/conversations/{str(convo.id).upper()}/send/', {'content': 'hi'},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(publish.await_args.args[0], chat.room_group(str(convo.id)))
+        self.assertEqual(chat.canonical_id(convo.id.hex.upper()), str(convo.id))
+        self.assertIsNone(chat.canonical_id('not-a-uuid'))
+
+
+class MarkReadTests(TestCase):
+    def setUp(self):
+        self.user = make_user(1)
+        self.convo = Conversation.objects.create(created_by=self.user)
+        self.other = Conversation.objects.create(created_by=self.user)
+        for convo in (self.convo, self.other):
+            ConversationParticipant.objects.create(conversation=convo, user=self.user)
+        self.client.force_login(self.user)
+
+    def mark(self, message_id):
+        return self.client.post(
+            f'/api/conversations/{self.convo.id}/read/', {'message_id': str(message_id)},
+            content_type='application/json',
+        )
+
+    def pointer(self):
+        return ConversationParticipant.objects.get(conversation=self.convo, user=self.user).last_read_message_id
+
+    def test_message_from_another_conversation_is_rejected(self):
+        elsewhere = Message.objects.create(conversation=self.other, sender=self.user, content='hi')
+        self.assertEqual(self.mark(elsewhere.id).status_code, 404)
+        self.assertFalse(chat.mark_read(self.convo.id, self.user.id, elsewhere.id))
+        self.assertIsNone(self.pointer())
+
+    def test_message_in_the_conversation_moves_the_pointer(self):
+        here = Message.objects.create(conversation=self.convo, sender=self.user, content='hi')
+        response = self.mark(here.id)
+        self.assertEqual((response.status_code, response.json()['updated']), (200, True))
+        self.assertEqual(self.pointer(), here.id)
+
+
+# ─── Like write-behind ───────────────────────────────────────────────────────
+
+class LikeBufferTests(TestCase):
+    def setUp(self):
+        self.author, self.fan = make_user(1), make_user(2)
+        self.buffer = likes.LikeBuffer(flush_interval=60, flush_batch=1000)
+        self.addCleanup(self._stop_timer)
+
+    def _stop_timer(self):
+        if self.buffer._timer is not None:
+            self.buffer._timer.cancel()
+
+    def test_deleted_post_does_not_block_the_batch(self):
+        gone = Post.objects.create(author=self.author, title='gone')
+        kept = Post.objects.create(author=self.author, title='kept')
+        self.buffer.toggle(gone.id, self.fan.id)
+        self.buffer.toggle(kept.id, self.fan.id)
+        gone.delete()
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(PostLike.objects.values_list('post_id', flat=True)), [kept.id])
+        kept.refresh_from_db()
+        self.assertEqual(kept.likes_count, 1)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_failed_flush_requeues_and_rearms_timer(self):
+        post = Post.objects.create(author=self.author, title='p')
+        self.buffer.toggle(post.id, self.fan.id)
+        with mock.patch.object(Post, 'recount', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+
+        self.assertIsNotNone(self.buffer._timer)
+        self.assertEqual(self.buffer.overlay([post.id], self.fan.id), ({post.id: 1}, {post.id: True}))
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertTrue(PostLike.objects.filter(post=post, user=self.fan).exists())
+
+
+# ─── Social graph ────────────────────────────────────────────────────────────
+
+class SocialGraphTests(TestCase):
+    def test_change_made_by_another_process_is_picked_up(self):
+        a, b = make_user(1), make_user(2)
+        local = graph.SocialGraph()
+        self.assertEqual(local.degree(a.id), 0)
+
+        # Another worker: the row and the stamp change, this process gets no signal
+        Connection.objects.bulk_create([Connection(from_user=a, to_user=b, status='accepted')])
+        graph.bump_version()
+        with mock.patch.object(graph, 'CHECK_INTERVAL', 0):
+            self.assertEqual(local.peers(a.id), [b.id])
+
+    def test_logged_changes_are_replayed_without_a_reload(self):
+        a, b = make_user(1), make_user(2)
+        local = graph.SocialGraph()
+        self.assertEqual(local.degree(a.id), 0)
+
+        graph.record_change(a.id, b.id, True)
+        with mock.patch.object(graph, 'CHECK_INTERVAL', 0), \
+                mock.patch.object(graph.SocialGraph, 'rebuild', side_effect=AssertionError('reloaded')):
+            self.assertEqual(local.peers(a.id), [b.id])
+            graph.record_change(b.id, a.id, False)
+            self.assertEqual(local.peers(a.id), [])
+
+    def test_only_edge_changes_bump_the_version(self):
+        a, b = make_user(1), make_user(2)
+        before = graph.current_version()
+        request = Connection.objects.create(from_user=a, to_user=b)
+        request.status = 'declined'
+        request.save()
+        request.delete()
+        self.assertEqual(graph.current_version(), before)
+
+        request = Connection.objects.create(from_user=a, to_user=b)
+        request.status = 'accepted'
+        request.save()
+        request.save()
+        self.assertEqual(graph.current_version(), before + 1)
+        Connection.objects.get(pk=request.pk).delete()
+        self.assertEqual(graph.current_version(), before + 2)
+
+
+# ─── API response cache ──────────────────────────────────────────────────────
+
+class ConditionalResponseTests(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        self.client.force_login(make_user(1))
+        Event.objects.create(title='Reunion')
+
+    def event_queries(self, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/events/', **headers)
+        return response, [q['sql'] for q in queries if 'reconnect_event' in q['sql']]
+
+    def test_warm_requests_skip_the_table(self):
+        first, _ = self.event_queries()
+        response, touched = self.event_queries()
+        self.assertEqual((response.status_code, touched), (200, []))
+        response, touched = self.event_queries(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((response.status_code, touched), (304, []))
+
+    def test_stamps_are_shared_through_the_database(self):
+        before = api_cache.get_versions(['events'])['events']
+        api_cache.bump('events')
+        bumped = ApiCacheVersion.objects.get(namespace='events').stamp
+        self.assertGreater(bumped, before)
+        # Another worker, whose process-local cache never saw the bump
+        caches['api'].clear()
+        self.assertEqual(api_cache.get_versions(['events']), {'events': bumped})
+
+    def test_write_changes_the_etag(self):
+        first, _ = self.event_queries()
+        Event.objects.create(title='Hackathon')
+        response, _ = self.event_queries(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+
+# ─── Live feed ───────────────────────────────────────────────────────────────
+
+class FeedPublisherTests(TestCase):
+    def test_burst_is_one_group_send_with_latest_counts(self):
+        publisher = live_feed.FeedPublisher(window=60)
+        self.addCleanup(publisher.flush)
+        for count in range(1, 51):
+            publisher.add({'type': 'post_likes', 'post_id': 7, 'likes': count})
+        publisher.add({'type': 'post_comments', 'post_id': 7, 'comments': 2})
+
+        layer = mock.AsyncMock()
+        with mock.patch.object(live_feed, 'get_channel_layer', return_value=layer):
+            self.assertEqual(publisher.flush(), 2)
+        layer.group_send.assert_awaited_once_with(live_feed.FEED_GROUP, {'type': 'feed.batch', 'events': [
+            {'type': 'post_likes', 'post_id': 7, 'likes': 50},
+            {'type': 'post_comments', 'post_id': 7, 'comments': 2},
+        ]})
+
+
+# ─── Message search ──────────────────────────────────────────────────────────
+
+class MessageSearchTests(TestCase):
+    def setUp(self):
+        self.me, self.other = make_user(1), make_user(2)
+        self.mine = self.conversation(self.me)
+        self.theirs = self.conversation(self.other)
+
+    def conversation(self, user):
+        convo = Conversation.objects.create(created_by=user)
+        ConversationParticipant.objects.create(conversation=convo, user=user)
+        return convo
+
+    def test_only_callers_conversations_are_matched(self):
+        # Better-ranked matches elsewhere must not crowd out the caller's
+        Message.objects.bulk_create([
+            Message(conversation=self.theirs, sender=self.other, content='hello hello hello')
+            for _ in range(30)
+        ])
+        mine = Message.objects.create(conversation=self.mine, sender=self.me, content='well hello there')
+
+        with CaptureQueriesContext(connection) as queries:
+            hits, next_cursor = search.search_messages(self.me.id, 'hello', limit=5)
+        self.assertEqual([message.id for message, _ in hits], [mine.id])
+        self.assertIsNone(next_cursor)
+        ranked = next(q['sql'] for q in queries if 'MATCH' in q['sql'])
+        self.assertIn(self.mine.id.hex, ranked)
+        self.assertNotIn(self.theirs.id.hex, ranked)
+
+    def test_other_conversation_is_not_searchable(self):
+        Message.objects.create(conversation=self.theirs, sender=self.other, content='hello')
+        self.assertEqual(search.search_messages(self.me.id, 'hello', conversation_id=self.theirs.id), ([], None))
+
+    def test_stale_index_entry_cannot_leak_another_conversation(self):
+        theirs = Message.objects.create(conversation=self.theirs, sender=self.other, content='private')
+        with connection.cursor() as c:
+            c.execute('SELECT rowid FROM reconnect_message WHERE id = %s', [theirs.id.hex])
+            rowid, = c.fetchone()
+            # What a renumbered table leaves behind: my entry, their row
+            c.execute(
+                f'INSERT INTO {search.FTS_TABLE}(rowid, content, conversation_id) VALUES (%s, %s, %s)',
+                [rowid, 'hello', self.mine.id.hex],
+            )
+        self.assertEqual(search.search_messages(self.me.id, 'hello'), ([], None))
+
+    def test_repair_restores_dropped_triggers(self):
+        with connection.cursor() as c:
+            for name in search.TRIGGERS_SQL:
+                c.execute(f'DROP TRIGGER {name}')
+        lost = Message.objects.create(conversation=self.mine, sender=self.me, content='hello again')
+        self.assertEqual(search.search_messages(self.me.id, 'hello'), ([], None))
+
+        self.assertTrue(search.repair())
+        self.assertFalse(search.repair())
+        new = Message.objects.create(conversation=self.mine, sender=self.me, content='hello later')
+        hits, _ = search.search_messages(self.me.id, 'hello')
+        self.assertEqual({message.id for message, _ in hits}, {lost.id, new.id})
+
+
+# ─── People recommendations ──────────────────────────────────────────────────
+
+class RecommendationTests(TestCase):
+    def test_role_filter_finds_the_minority_role(self):
+        me = make_user(0, department='CS')
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f'peer{n}', enrollment_number=f'P{n}', department='CS',
+                       role='alumni' if n >= 150 else 'student')
+            for n in range(160)
+        ])
+        # Students alone fill a role-blind top 100, ties going to the lower ids
+        rows, _ = recommendations.page(me.id, role='alumni', limit=50)
+        self.assertEqual(len(rows), 10)
+        self.assertEqual({row.candidate.role for row in rows}, {'alumni'})
+
+
+# ─── Home timelines ──────────────────────────────────────────────────────────
+
+class TimelineTests(TestCase):
+    def test_rebuild_keeps_authors_own_fanout_on_read_posts(self):
+        author, peer = make_user(1), make_user(2)
+        Connection.objects.create(from_user=author, to_user=peer, status='accepted')
+        post = Post.objects.create(author=author, title='big news')
+        with mock.patch.object(timeline, 'TIMELINE_FANOUT_LIMIT', 0):
+            timeline.fan_out(post)
+        self.assertTrue(Post.objects.get(id=post.id).fanout_on_read)
+
+        timeline.rebuild(author.id)
+        timeline.rebuild(peer.id)
+        for user in (author, peer):
+            posts, _ = timeline.read_page(user, None, 10)
+            self.assertEqual([p.id for p in posts], [post.id])
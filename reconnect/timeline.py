@@ -0,0 +1,125 @@
+"""
+Materialized per-user home timelines.
+
+When a post is created it is pushed into the timelines of its author and the
+author's accepted connections (fan-out on write).  Timelines are trimmed to
+``TIMELINE_MAX_LENGTH`` entries off the write path: when their owner loads
+the first page, and by ``manage.py trim_timelines`` for everyone else.
+Authors with more than
+``TIMELINE_FANOUT_LIMIT`` connections are not fanned out; their posts are
+flagged ``fanout_on_read`` and merged into readers' pages at read time.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from reconnect.graph import graph
+from reconnect.models import Post, TimelineEntry
+from reconnect.pagination import encode_cursor, seek
+
+TIMELINE_MAX_LENGTH = getattr(settings, 'TIMELINE_MAX_LENGTH', 500)
+TIMELINE_FANOUT_LIMIT = getattr(settings, 'TIMELINE_FANOUT_LIMIT', 1000)
+
+
+def accepted_peer_ids(user_id):
+    """IDs of everyone ``user_id`` has an accepted connection with."""
+    return graph.peers(user_id)
+
+
+def trim(user_id):
+    """
+    Drop everything past the newest TIMELINE_MAX_LENGTH entries of one
+    timeline.  Finding the boundary is a bounded walk of timeline_user_idx,
+    so an already short timeline costs one small query.
+    """
+    boundary = TimelineEntry.objects.filter(user_id=user_id).order_by(
+        '-created_at', '-post_id',
+    ).values_list('created_at', 'post_id')[TIMELINE_MAX_LENGTH - 1:TIMELINE_MAX_LENGTH].first()
+    if boundary is None:
+        return 0
+    created_at, post_id = boundary
+    deleted, _ = TimelineEntry.objects.filter(
+        Q(created_at__lt=created_at) | Q(created_at=created_at, post_id__lt=post_id),
+        user_id=user_id,
+    ).delete()
+    return deleted
+
+
+def overgrown_user_ids():
+    """Users whose timeline holds more than TIMELINE_MAX_LENGTH entries."""
+    return TimelineEntry.objects.values('user_id').annotate(n=Count('id')).filter(
+        n__gt=TIMELINE_MAX_LENGTH,
+    ).values_list('user_id', flat=True).order_by()
+
+
+def fan_out(post):
+    """Deliver a freshly created post.  Returns the number of timelines written."""
+    peers = accepted_peer_ids(post.author_id)
+    if len(peers) > TIMELINE_FANOUT_LIMIT:
+        # Too expensive to push; readers pull it via read_page() instead.
+        Post.objects.filter(id=post.id).update(fanout_on_read=True)
+        post.fanout_on_read = True
+        recipients = [post.author_id]
+    else:
+        recipients = [post.author_id, *peers]
+
+    # Trimming is left to readers and trim_timelines; see the module docstring
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=uid, post_id=post.id, created_at=post.created_at) for uid in recipients],
+        ignore_conflicts=True,
+        batch_size=500,
+    )
+    return len(recipients)
+
+
+def rebuild(user_id):
+    """
+    Recreate one user's timeline from scratch, e.g. after the connection
+    graph changed.  Peers' fan-out-on-read posts are left to read_page();
+    the user's own always go in, as fan_out() delivers them.
+    """
+    authors = [user_id, *accepted_peer_ids(user_id)]
+    latest = []
+    for i in range(0, len(authors), 500):
+        latest += Post.objects.filter(
+            Q(fanout_on_read=False) | Q(author_id=user_id), author_id__in=authors[i:i + 500], is_active=True,
+        ).order_by('-created_at', '-id').values_list('id', 'created_at')[:TIMELINE_MAX_LENGTH]
+    latest.sort(key=lambda row: (row[1], row[0]), reverse=True)
+
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=pid, created_at=ts)
+             for pid, ts in latest[:TIMELINE_MAX_LENGTH]],
+            batch_size=500,
+        )
+
+
+def read_page(user, cursor, limit):
+    """
+    Return ``(posts, next_cursor)`` for one page of ``user``'s home timeline.
+    Cost is proportional to ``limit``, not to the size of the Post table.
+    """
+    if not cursor:
+        trim(user.id)
+    keys = list(
+        seek(TimelineEntry.objects.filter(user=user), cursor, tiebreak='post_id')
+        .values_list('created_at', 'post_id')[:limit + 1]
+    )
+
+    # Fan-out-on-read fallback for very well connected authors
+    peers = accepted_peer_ids(user.id)
+    if peers:
+        pulled = Post.objects.filter(fanout_on_read=True, is_active=True, author_id__in=peers)
+        keys += seek(pulled, cursor).values_list('created_at', 'id')[:limit + 1]
+        keys.sort(reverse=True)
+
+    next_cursor = None
+    if len(keys) > limit:
+        keys = keys[:limit]
+        next_cursor = encode_cursor(*keys[-1])
+
+    by_id = Post.objects.filter(
+        id__in=[pid for _, pid in keys], is_active=True,
+    ).select_related('author').in_bulk()
+    return [by_id[pid] for _, pid in keys if pid in by_id], next_cursor
@@ -45,6 +45,9 @@ urlpatterns = [
     path('api/conversations/create/', views.conversation_create, name='conversation_create'),
     path('api/conversations/<str:conversation_id>/messages/', views.conversation_messages, name='conversation_messages'),
     path('api/conversations/<str:conversation_id>/send/', views.send_message, name='send_message'),
+    path('api/conversations/<str:conversation_id>/read/', views.mark_conversation_read, name='mark_conversation_read'),
+    path('api/messages/search/', views.search_messages, name='search_messages'),
+    path('api/presence/', views.presence_status, name='presence_status'),
     path('api/users/search/', views.user_search, name='user_search'),
 
     # ── Events & Announcements API ────────────────────────────────────────
@@ -57,6 +60,7 @@ urlpatterns = [
 
     # ── Post / Social Feed API ────────────────────────────────────────────
     path('api/posts/', views.api_posts_list, name='api_posts_list'),
+    path('api/timeline/', views.api_timeline, name='api_timeline'),
     path('api/posts/create/', views.create_post, name='create_post'),
     path('api/posts/<int:post_id>/like/', views.toggle_like, name='toggle_like'),
     path('api/posts/<int:post_id>/comment/', views.add_comment, name='add_comment'),
@@ -70,9 +74,11 @@ urlpatterns = [
     # ── Opportunities & Projects API ──────────────────────────────────────
     path('api/opportunities/', views.api_opportunities_list, name='api_opportunities_list'),
     path('api/projects/', views.api_projects_list, name='api_projects_list'),
+    path('api/cache/stats/', views.api_cache_stats, name='api_cache_stats'),
 
     # ── Explore / People API ──────────────────────────────────────────────
     path('api/explore/', views.api_explore_people, name='api_explore_people'),
+    path('api/explore/recommended/', views.api_recommended_people, name='api_recommended_people'),
 ]
 
 # Serve media files in development
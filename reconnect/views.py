@@ -1,22 +1,36 @@
 import csv
 import io
 import json
+import uuid
 from functools import wraps
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout, update_session_auth_hash
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST, require_GET
 from django.views.decorators.csrf import ensure_csrf_cookie
-from django.db.models import Q, Max
+from django.db import transaction
+from django.db.models import Q, F
 
 from reconnect.models import (
     CustomUser, Conversation, ConversationParticipant, Message,
     Event, EventTimelineItem, Announcement,
     Post, PostLike, PostComment, Connection, Opportunity, Project,
 )
+from reconnect.pagination import InvalidCursor, paginate, parse_limit
+from reconnect import (
+    api_cache, chat, images, likes, live_feed, presence, recommendations, search, timeline,
+)
+from reconnect.api_cache import cached_response, conditional
+from reconnect.graph import graph
+
+FEED_PAGE_SIZE = 50
+FEED_MAX_PAGE_SIZE = 100
+COMMENTS_PAGE_SIZE = 20
+COMMENTS_MAX_PAGE_SIZE = 100
 
 
 # ─── Role decorator ──────────────────────────────────────────────────────────
@@ -81,9 +95,7 @@ def admin_dashboard(request):
 @login_required
 def student_dashboard(request):
     events_list = Event.objects.filter(is_active=True)
-    connection_count = Connection.objects.filter(
-        Q(from_user=request.user, status='accepted') | Q(to_user=request.user, status='accepted')
-    ).count()
+    connection_count = graph.degree(request.user.id)
     post_count = Post.objects.filter(author=request.user).count()
     return render(request, "student/studentdash.html", {
         'user': request.user,
@@ -187,9 +199,7 @@ def student_projects(request):
 
 @login_required
 def student_profile(request):
-    connection_count = Connection.objects.filter(
-        Q(from_user=request.user, status='accepted') | Q(to_user=request.user, status='accepted')
-    ).count()
+    connection_count = graph.degree(request.user.id)
     post_count = Post.objects.filter(author=request.user).count()
     project_count = Project.objects.filter(posted_by=request.user).count()
     return render(request, "student/student_profile.html", {
@@ -267,64 +277,117 @@ def create_post(request):
         post.open_for_tags = ','.join(tags)
 
     post.save()
+    if post.image:
+        post.image_variants = images.generate_variants(post.image, images.POST_IMAGE_VARIANTS)
+        post.save(update_fields=['image_variants'])
+    timeline.fan_out(post)
+    live_feed.post_created(post)
     return JsonResponse({'success': True, 'message': 'Post published!', 'id': post.id})
 
 
+def _serialize_posts(posts, user):
+    """Feed card payloads for ``posts``, with liked_by_me resolved in one query."""
+    post_ids = [p.id for p in posts]
+    liked_ids = set(PostLike.objects.filter(
+        user=user, post_id__in=post_ids,
+    ).values_list('post_id', flat=True))
+    like_deltas = {}
+    if likes.WRITE_BEHIND:
+        # Fold in likes that are still sitting in the write-behind buffer
+        like_deltas, liked_overrides = likes.buffer.overlay(post_ids, user.id)
+        for pid, liked in liked_overrides.items():
+            (liked_ids.add if liked else liked_ids.discard)(pid)
+    return [{
+        'id': p.id,
+        'post_type': p.post_type,
+        'title': p.title,
+        'body': p.body,
+        'image': p.image_url('feed'),
+        'image_variants': p.image_urls(),
+        'author_name': p.author.get_full_name() or p.author.username,
+        'author_initials': p.author.get_initials(),
+        'author_department': p.author.department,
+        'author_id': p.author.id,
+        'author_profile_picture': p.author.avatar_url(),
+        'author_avatar': p.author.avatar_urls(),
+        'company': p.company,
+        'role': p.role,
+        'job_type': p.job_type,
+        'location': p.location,
+        'amount': p.amount,
+        'open_for_tags': p.open_for_tags.split(',') if p.open_for_tags else [],
+        'likes': max(0, p.likes_count + like_deltas.get(p.id, 0)),
+        'comments': p.comments_count,
+        'liked_by_me': p.id in liked_ids,
+        'created_at': p.created_at.strftime('%b %d, %Y %H:%M'),
+    } for p in posts]
+
+
 @require_GET
 @login_required
 def api_posts_list(request):
-    """Return feed posts."""
+    """
+    Return one page of feed posts, newest first.
+    Query params: ?user_id= (profile feed), ?limit=, ?cursor= (from next_cursor).
+    """
     qs = Post.objects.filter(is_active=True).select_related('author')
     # Optional filter by user
     user_id = request.GET.get('user_id')
     if user_id:
         qs = qs.filter(author_id=user_id)
-    posts = qs[:50]
-    user = request.user
-    result = []
-    for p in posts:
-        result.append({
-            'id': p.id,
-            'post_type': p.post_type,
-            'title': p.title,
-            'body': p.body,
-            'image': p.image.url if p.image else '',
-            'author_name': p.author.get_full_name() or p.author.username,
-            'author_initials': p.author.get_initials(),
-            'author_department': p.author.department,
-            'author_id': p.author.id,
-            'author_profile_picture': p.author.profile_picture.url if p.author.profile_picture else '',
-            'company': p.company,
-            'role': p.role,
-            'job_type': p.job_type,
-            'location': p.location,
-            'amount': p.amount,
-            'open_for_tags': p.open_for_tags.split(',') if p.open_for_tags else [],
-            'likes': p.like_count(),
-            'comments': p.comment_count(),
-            'liked_by_me': p.likes.filter(user=user).exists(),
-            'created_at': p.created_at.strftime('%b %d, %Y %H:%M'),
-        })
-    return JsonResponse({'posts': result})
+    limit = parse_limit(request, FEED_PAGE_SIZE, FEED_MAX_PAGE_SIZE)
+    try:
+        posts, next_cursor = paginate(qs, request.GET.get('cursor'), limit)
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    result = _serialize_posts(posts, request.user)
+    return JsonResponse({'posts': result, 'next_cursor': next_cursor})
+
+
+@require_GET
+@login_required
+def api_timeline(request):
+    """
+    Return one page of the user's home timeline: their own posts and those of
+    their accepted connections, newest first.  Query params: ?limit=, ?cursor=.
+    """
+    limit = parse_limit(request, FEED_PAGE_SIZE, FEED_MAX_PAGE_SIZE)
+    try:
+        posts, next_cursor = timeline.read_page(request.user, request.GET.get('cursor'), limit)
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    return JsonResponse({'posts': _serialize_posts(posts, request.user), 'next_cursor': next_cursor})
 
 
 @require_POST
 @login_required
 def toggle_like(request, post_id):
     """Toggle like on a post."""
-    post = get_object_or_404(Post, id=post_id)
-    like, created = PostLike.objects.get_or_create(post=post, user=request.user)
-    if not created:
-        like.delete()
-        return JsonResponse({'liked': False, 'count': post.like_count()})
-    return JsonResponse({'liked': True, 'count': post.like_count()})
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    if likes.WRITE_BEHIND:
+        liked, count = likes.buffer.toggle(post.id, request.user.id)
+        live_feed.likes_changed(post.id, count)
+        return JsonResponse({'liked': liked, 'count': count})
+
+    with transaction.atomic():
+        deleted, _ = PostLike.objects.filter(post=post, user=request.user).delete()
+        if deleted:
+            liked, delta = False, -1
+        else:
+            _, created = PostLike.objects.get_or_create(post=post, user=request.user)
+            liked, delta = True, 1 if created else 0
+        if delta:
+            Post.objects.filter(id=post.id).update(likes_count=F('likes_count') + delta)
+        count = Post.objects.filter(id=post.id).values_list('likes_count', flat=True).get()
+    live_feed.likes_changed(post.id, count)
+    return JsonResponse({'liked': liked, 'count': count})
 
 
 @require_POST
 @login_required
 def add_comment(request, post_id):
     """Add a comment to a post."""
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
     try:
         data = json.loads(request.body)
         content = data.get('content', '').strip()
@@ -332,33 +395,61 @@ def add_comment(request, post_id):
         content = request.POST.get('content', '').strip()
     if not content:
         return JsonResponse({'error': 'Comment cannot be empty'}, status=400)
-    comment = PostComment.objects.create(post=post, user=request.user, content=content)
+    user = request.user
+    with transaction.atomic():
+        comment = PostComment.objects.create(post=post, user=user, content=content)
+        Post.objects.filter(id=post.id).update(comments_count=F('comments_count') + 1)
+        total = Post.objects.filter(id=post.id).values_list('comments_count', flat=True).get()
+    live_feed.comments_changed(post.id, total)
     return JsonResponse({
         'success': True,
-        'comment': {
-            'id': comment.id,
-            'content': comment.content,
-            'user_name': comment.user.get_full_name() or comment.user.username,
-            'user_initials': comment.user.get_initials(),
-            'created_at': comment.created_at.strftime('%b %d, %Y %H:%M'),
-        }
+        'total': total,
+        'comment': _serialize_comment(comment, user),
     })
 
 
+def _serialize_comment(comment, user):
+    return {
+        'id': comment.id,
+        'content': comment.content,
+        'user_name': user.get_full_name() or user.username,
+        'user_initials': user.get_initials(),
+        'created_at': comment.created_at.strftime('%b %d, %Y %H:%M'),
+    }
+
+
 @require_GET
 @login_required
 def get_comments(request, post_id):
-    """Get comments for a post."""
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.select_related('user').all()
-    result = [{
-        'id': c.id,
-        'content': c.content,
-        'user_name': c.user.get_full_name() or c.user.username,
-        'user_initials': c.user.get_initials(),
-        'created_at': c.created_at.strftime('%b %d, %Y %H:%M'),
-    } for c in comments]
-    return JsonResponse({'comments': result})
+    """
+    Return a post's comments, oldest first, one page at a time.
+    Query params: ?limit=, ?cursor= (from next_cursor), or ?latest=N for just
+    the newest N comments (feed card preview).  ``total`` comes from the
+    post's maintained counter.
+    """
+    post = get_object_or_404(Post.objects.only('id', 'comments_count'), id=post_id)
+    qs = PostComment.objects.filter(post=post).select_related('user')
+
+    latest = request.GET.get('latest')
+    if latest:
+        try:
+            n = max(1, min(int(latest), COMMENTS_MAX_PAGE_SIZE))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid latest'}, status=400)
+        comments = list(qs.order_by('-created_at', '-id')[:n])[::-1]
+        next_cursor = None
+    else:
+        limit = parse_limit(request, COMMENTS_PAGE_SIZE, COMMENTS_MAX_PAGE_SIZE)
+        try:
+            comments, next_cursor = paginate(qs, request.GET.get('cursor'), limit, descending=False)
+        except InvalidCursor:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'comments': [_serialize_comment(c, c.user) for c in comments],
+        'next_cursor': next_cursor,
+        'total': post.comments_count,
+    })
 
 
 # ─── Connection API ───────────────────────────────────────────────────────────
@@ -408,6 +499,9 @@ def respond_connection(request, connection_id):
     if action == 'accept':
         conn.status = 'accepted'
         conn.save()
+        # Pull each other's recent posts into both home timelines
+        timeline.rebuild(conn.from_user_id)
+        timeline.rebuild(conn.to_user_id)
         return JsonResponse({'success': True, 'status': 'accepted'})
     elif action == 'decline':
         conn.status = 'declined'
@@ -436,7 +530,8 @@ def connection_list(request):
             'initials': other.get_initials(),
             'department': other.department,
             'enrollment_number': other.enrollment_number,
-            'profile_picture': other.profile_picture.url if other.profile_picture else '',
+            'profile_picture': other.avatar_url(),
+            'avatar': other.avatar_urls(),
         })
 
     # Pending requests received
@@ -447,7 +542,8 @@ def connection_list(request):
         'name': c.from_user.get_full_name() or c.from_user.username,
         'initials': c.from_user.get_initials(),
         'department': c.from_user.department,
-        'profile_picture': c.from_user.profile_picture.url if c.from_user.profile_picture else '',
+        'profile_picture': c.from_user.avatar_url(),
+        'avatar': c.from_user.avatar_urls(),
     } for c in pending]
 
     return JsonResponse({'connections': connections, 'pending_requests': requests_list})
@@ -457,6 +553,11 @@ def connection_list(request):
 
 @require_GET
 @login_required
+@conditional('opportunities', depends_on=('posts', 'users'), sources=(
+    Opportunity.objects.filter(is_active=True),
+    Post.objects.filter(is_active=True, post_type='hiring'),
+))
+@cached_response('opportunities', depends_on=('posts', 'users'))
 def api_opportunities_list(request):
     """Return active opportunities + hiring posts."""
     # From Opportunity model
@@ -471,7 +572,7 @@ def api_opportunities_list(request):
         'stipend': o.stipend,
         'application_url': o.application_url,
         'posted_by': o.posted_by.get_full_name() if o.posted_by else '',
-        'poster_profile_picture': o.posted_by.profile_picture.url if (o.posted_by and o.posted_by.profile_picture) else '',
+        'poster_profile_picture': o.posted_by.avatar_url() if o.posted_by else '',
         'created_at': o.created_at.strftime('%b %d, %Y'),
     } for o in opps]
 
@@ -488,7 +589,7 @@ def api_opportunities_list(request):
             'stipend': p.stipend or 'Not specified',
             'application_url': p.application_url or '',
             'posted_by': p.author.get_full_name() or p.author.username,
-            'poster_profile_picture': p.author.profile_picture.url if p.author.profile_picture else '',
+            'poster_profile_picture': p.author.avatar_url(),
             'created_at': p.created_at.strftime('%b %d, %Y'),
         })
 
@@ -497,6 +598,11 @@ def api_opportunities_list(request):
 
 @require_GET
 @login_required
+@conditional('projects', depends_on=('posts', 'users'), sources=(
+    Project.objects.filter(is_active=True),
+    Post.objects.filter(is_active=True, post_type='funding'),
+))
+@cached_response('projects', depends_on=('posts', 'users'))
 def api_projects_list(request):
     """Return active projects + funding/grant posts."""
     # From Project model
@@ -509,7 +615,7 @@ def api_projects_list(request):
         'tech_stack': p.tech_stack,
         'team_size': p.team_size,
         'posted_by': p.posted_by.get_full_name() if p.posted_by else '',
-        'poster_profile_picture': p.posted_by.profile_picture.url if (p.posted_by and p.posted_by.profile_picture) else '',
+        'poster_profile_picture': p.posted_by.avatar_url() if p.posted_by else '',
         'created_at': p.created_at.strftime('%b %d, %Y'),
     } for p in projs]
 
@@ -524,7 +630,7 @@ def api_projects_list(request):
             'tech_stack': '',
             'team_size': 1,
             'posted_by': fp.author.get_full_name() or fp.author.username,
-            'poster_profile_picture': fp.author.profile_picture.url if fp.author.profile_picture else '',
+            'poster_profile_picture': fp.author.avatar_url(),
             'created_at': fp.created_at.strftime('%b %d, %Y'),
             'amount': fp.amount or '',
             'eligibility': fp.eligibility or '',
@@ -533,8 +639,54 @@ def api_projects_list(request):
     return JsonResponse({'projects': result})
 
 
+@require_GET
+@role_required('admin')
+def api_cache_stats(request):
+    """Hit / miss counters for the cached list endpoints."""
+    return JsonResponse({'cache': api_cache.stats()})
+
+
 # ─── Explore / People Search API ─────────────────────────────────────────────
 
+_STATUS_PRIORITY = {'accepted': 0, 'pending': 1, 'declined': 2}
+
+
+def _connection_statuses(user_id, other_ids):
+    """
+    ``{other_id: status}`` between ``user_id`` and each of ``other_ids``, in
+    either direction, with one query.  If both directions exist the most
+    advanced status wins.
+    """
+    rows = Connection.objects.filter(
+        Q(from_user_id=user_id, to_user_id__in=other_ids)
+        | Q(to_user_id=user_id, from_user_id__in=other_ids)
+    ).values_list('from_user_id', 'to_user_id', 'status')
+    statuses = {}
+    for from_id, to_id, status in rows:
+        other_id = to_id if from_id == user_id else from_id
+        current = statuses.get(other_id)
+        if current is None or _STATUS_PRIORITY[status] < _STATUS_PRIORITY[current]:
+            statuses[other_id] = status
+    return statuses
+
+
+def _serialize_person(u, connection_status, mutual_connections):
+    return {
+        'id': u.id,
+        'name': u.get_full_name() or u.username,
+        'initials': u.get_initials(),
+        'department': u.department,
+        'role': u.role,
+        'enrollment_number': u.enrollment_number,
+        'passed_out_year': u.passed_out_year,
+        'working_status': u.working_status,
+        'connection_status': connection_status,
+        'mutual_connections': mutual_connections,
+        'profile_picture': u.avatar_url(),
+        'avatar': u.avatar_urls(),
+    }
+
+
 @require_GET
 @login_required
 def api_explore_people(request):
@@ -555,32 +707,42 @@ def api_explore_people(request):
     if role_filter and role_filter != 'all':
         qs = qs.filter(role=role_filter)
 
-    users = qs[:30]
-    user = request.user
-
-    result = []
-    for u in users:
-        # Check connection status
-        conn = Connection.objects.filter(
-            Q(from_user=user, to_user=u) | Q(from_user=u, to_user=user)
-        ).first()
-        conn_status = conn.status if conn else 'none'
+    users = list(qs[:30])
+    statuses = _connection_statuses(request.user.id, [u.id for u in users])
+    mutuals = graph.mutual_counts(request.user.id, [u.id for u in users])
 
-        result.append({
-            'id': u.id,
-            'name': u.get_full_name() or u.username,
-            'initials': u.get_initials(),
-            'department': u.department,
-            'role': u.role,
-            'enrollment_number': u.enrollment_number,
-            'passed_out_year': u.passed_out_year,
-            'working_status': u.working_status,
-            'connection_status': conn_status,
-            'profile_picture': u.profile_picture.url if u.profile_picture else '',
-        })
+    result = [_serialize_person(u, statuses.get(u.id, 'none'), mutuals[u.id]) for u in users]
     return JsonResponse({'people': result})
 
 
+@require_GET
+@login_required
+def api_recommended_people(request):
+    """
+    "People you may know", best match first.
+    Query params: ?role=student|alumni, ?cursor= (from next_cursor), ?limit=.
+    """
+    role_filter = request.GET.get('role', '').strip()
+    limit = parse_limit(request, 20, 50)
+    try:
+        rows, next_cursor = recommendations.page(
+            request.user.id,
+            role=role_filter if role_filter and role_filter != 'all' else None,
+            cursor=request.GET.get('cursor'),
+            limit=limit,
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    statuses = _connection_statuses(request.user.id, [r.candidate_id for r in rows])
+    people = []
+    for r in rows:
+        person = _serialize_person(r.candidate, statuses.get(r.candidate_id, 'none'), r.mutual_count)
+        person['score'] = round(r.score, 3)
+        people.append(person)
+    return JsonResponse({'people': people, 'next_cursor': next_cursor})
+
+
 # ─── CSV / Bulk Upload ───────────────────────────────────────────────────────
 
 @require_POST
@@ -746,6 +908,7 @@ def update_profile(request):
     # Profile picture upload
     pic = request.FILES.get('profile_picture')
     if pic:
+        old_variants = user.profile_picture_variants
         user.profile_picture = pic
         updated.append('profile_picture')
 
@@ -768,6 +931,11 @@ def update_profile(request):
 
     user.save()
 
+    if pic:
+        images.delete_variants(user.profile_picture.storage, old_variants)
+        user.profile_picture_variants = images.generate_variants(user.profile_picture, images.AVATAR_VARIANTS)
+        user.save(update_fields=['profile_picture_variants'])
+
     # Keep user logged in after password change
     if 'password' in updated:
         update_session_auth_hash(request, user)
@@ -776,6 +944,7 @@ def update_profile(request):
         'success': True,
         'message': f'Updated: {", ".join(updated)}' if updated else 'No changes made',
         'profile_picture_url': user.profile_picture.url if user.profile_picture else '',
+        'avatar': user.avatar_urls(),
     })
 
 
@@ -786,33 +955,47 @@ def update_profile(request):
 def conversation_list(request):
     """Return the current user's conversations with last message info."""
     user = request.user
-    convos = Conversation.objects.filter(
-        membership__user=user
-    ).annotate(
-        last_msg_time=Max('messages__timestamp')
-    ).order_by('-last_msg_time')
+    memberships = list(
+        ConversationParticipant.objects.filter(user=user)
+        .select_related('conversation', 'conversation__last_sender')
+        .order_by(F('last_message_at').desc(nulls_last=True), '-id')
+    )
+
+    # Resolve the other person of every 1-on-1 chat in one query
+    direct_ids = [m.conversation_id for m in memberships if not m.conversation.is_group]
+    peers = {
+        p.conversation_id: p.user
+        for p in ConversationParticipant.objects.filter(
+            conversation_id__in=direct_ids,
+        ).exclude(user=user).select_related('user')
+    }
+
+    unread = chat.unread_counts(user.id)
+    online = presence.statuses({p.id for p in peers.values()})
 
     result = []
-    for c in convos:
-        last_msg = c.last_message()
-        # For 1-on-1, get the other person's name
+    for m in memberships:
+        c = m.conversation
+        other = peers.get(c.id) if not c.is_group else None
         if not c.is_group:
-            other = c.membership.exclude(user=user).select_related('user').first()
-            display_name = other.user.get_full_name() or other.user.username if other else 'Unknown'
-            initials = other.user.get_initials() if other else '??'
+            display_name = other.get_full_name() or other.username if other else 'Unknown'
+            initials = other.get_initials() if other else '??'
         else:
             display_name = c.name or 'Group'
             initials = 'GRP'
 
+        sender = c.last_sender
         result.append({
             'id': str(c.id),
             'name': display_name,
             'initials': initials,
             'is_group': c.is_group,
-            'profile_picture': other.user.profile_picture.url if (not c.is_group and other and other.user.profile_picture) else '',
-            'last_message': last_msg.content[:50] if last_msg else '',
-            'last_message_sender': (last_msg.sender.first_name or last_msg.sender.username) if last_msg else '',
-            'last_message_time': last_msg.timestamp.strftime('%H:%M') if last_msg else '',
+            'profile_picture': other.avatar_url() if other else '',
+            'last_message': c.last_message_preview[:50],
+            'last_message_sender': (sender.first_name or sender.username) if sender else '',
+            'last_message_time': c.last_message_at.strftime('%H:%M') if c.last_message_at else '',
+            'unread': unread.get(c.id, 0),
+            'presence': online[other.id] if other else '',
         })
 
     return JsonResponse({'conversations': result})
@@ -836,20 +1019,21 @@ def conversation_create(request):
 
     if is_group:
         name = data.get('name', 'New Group')
-        user_ids = data.get('user_ids', [])
-
-        convo = Conversation.objects.create(
-            name=name,
-            is_group=True,
-            created_by=user,
-        )
-        ConversationParticipant.objects.create(conversation=convo, user=user)
-        for uid in user_ids:
-            try:
-                member = CustomUser.objects.get(id=uid)
-                ConversationParticipant.objects.get_or_create(conversation=convo, user=member)
-            except CustomUser.DoesNotExist:
-                pass
+        try:
+            user_ids = {int(uid) for uid in data.get('user_ids', [])}
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'user_ids must be a list of ids'}, status=400)
+
+        # Unknown ids are skipped, as before
+        member_ids = {user.id, *CustomUser.objects.filter(id__in=user_ids).values_list('id', flat=True)}
+        with transaction.atomic():
+            convo = Conversation.objects.create(
+                name=name,
+                is_group=True,
+                created_by=user,
+            )
+            chat.add_participants(convo, member_ids)
+        chat.conversation_added(convo.id, member_ids)
 
         return JsonResponse({'id': str(convo.id), 'name': convo.name})
 
@@ -860,23 +1044,15 @@ def conversation_create(request):
 
         try:
             other_user = CustomUser.objects.get(id=other_id)
-        except CustomUser.DoesNotExist:
+        except (CustomUser.DoesNotExist, ValueError):
             return JsonResponse({'error': 'User not found'}, status=404)
+        if other_user.id == user.id:
+            return JsonResponse({'error': 'Cannot start a chat with yourself'}, status=400)
 
-        # Check for existing 1-on-1 conversation
-        existing = Conversation.objects.filter(
-            is_group=False,
-            membership__user=user,
-        ).filter(
-            membership__user=other_user,
-        ).first()
-
-        if existing:
-            return JsonResponse({'id': str(existing.id), 'name': other_user.get_full_name(), 'existing': True})
-
-        convo = Conversation.objects.create(is_group=False, created_by=user)
-        ConversationParticipant.objects.create(conversation=convo, user=user)
-        ConversationParticipant.objects.create(conversation=convo, user=other_user)
+        convo, created = chat.get_or_create_direct(user.id, other_user.id)
+        if not created:
+            return JsonResponse({'id': str(convo.id), 'name': other_user.get_full_name(), 'existing': True})
+        chat.conversation_added(convo.id, [user.id, other_user.id])
 
         return JsonResponse({
             'id': str(convo.id),
@@ -887,20 +1063,27 @@ def conversation_create(request):
 @require_GET
 @login_required
 def conversation_messages(request, conversation_id):
-    """Return message history for a conversation (paginated)."""
+    """
+    Return message history for a conversation, oldest first.
+    Query params: ?before=<message id> for older messages, ?after=<message id>
+    for newer ones, ?limit=.  Defaults to the newest page.
+    """
     user = request.user
 
     # Ensure user is a participant
-    if not ConversationParticipant.objects.filter(conversation_id=conversation_id, user=user).exists():
+    if not chat.is_participant(conversation_id, user.id):
         return JsonResponse({'error': 'Not a participant'}, status=403)
 
-    page = int(request.GET.get('page', 1))
-    page_size = 50
-    offset = (page - 1) * page_size
-
-    msgs = Message.objects.filter(
-        conversation_id=conversation_id
-    ).select_related('sender').order_by('-timestamp')[offset:offset + page_size]
+    limit = parse_limit(request, chat.HISTORY_PAGE_SIZE, chat.HISTORY_PAGE_SIZE * 2)
+    try:
+        msgs, has_more_before, has_more_after = chat.message_window(
+            conversation_id,
+            before=request.GET.get('before'),
+            after=request.GET.get('after'),
+            limit=limit,
+        )
+    except ValidationError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
 
     result = [{
         'id': str(m.id),
@@ -910,9 +1093,13 @@ def conversation_messages(request, conversation_id):
         'sender_initials': m.sender.get_initials(),
         'timestamp': m.timestamp.strftime('%H:%M'),
         'is_mine': m.sender.id == user.id,
-    } for m in reversed(msgs)]
+    } for m in msgs]
 
-    return JsonResponse({'messages': result, 'page': page})
+    return JsonResponse({
+        'messages': result,
+        'has_more_before': has_more_before,
+        'has_more_after': has_more_after,
+    })
 
 
 @require_POST
@@ -921,7 +1108,7 @@ def send_message(request, conversation_id):
     """Send a message to a conversation via HTTP (fallback when WebSocket is unavailable)."""
     user = request.user
 
-    if not ConversationParticipant.objects.filter(conversation_id=conversation_id, user=user).exists():
+    if not chat.is_participant(conversation_id, user.id):
         return JsonResponse({'error': 'Not a participant'}, status=403)
 
     try:
@@ -933,8 +1120,8 @@ def send_message(request, conversation_id):
     if not content:
         return JsonResponse({'error': 'Empty message'}, status=400)
 
-    conversation = get_object_or_404(Conversation, id=conversation_id)
-    msg = Message.objects.create(conversation=conversation, sender=user, content=content)
+    # Persisted and broadcast to the room's sockets like a WebSocket frame
+    msg = chat.send_message(conversation_id, user, content)
 
     return JsonResponse({
         'id': str(msg.id),
@@ -945,6 +1132,104 @@ def send_message(request, conversation_id):
     })
 
 
+@require_POST
+@login_required
+def mark_conversation_read(request, conversation_id):
+    """
+    Move the current user's read pointer forward.
+    POST { message_id: '<id>' }; without a message_id, everything so far is read.
+    """
+    user = request.user
+
+    if not chat.is_participant(conversation_id, user.id):
+        return JsonResponse({'error': 'Not a participant'}, status=403)
+
+    try:
+        data = json.loads(request.body or '{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    message_id = data.get('message_id')
+    if message_id:
+        try:
+            message_id = uuid.UUID(str(message_id))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid message_id'}, status=400)
+        if not chat.has_message(conversation_id, message_id):
+            return JsonResponse({'error': 'Message not found in this conversation'}, status=404)
+    else:
+        message_id = Message.objects.filter(conversation_id=conversation_id).order_by('-id').values_list('id', flat=True).first()
+        if message_id is None:
+            return JsonResponse({'success': True, 'updated': False})
+
+    updated = chat.mark_read(conversation_id, user.id, message_id)
+    return JsonResponse({'success': True, 'updated': updated})
+
+
+@require_GET
+@login_required
+def search_messages(request):
+    """
+    Full-text search over the current user's chat messages, best match first.
+    Query params: ?q=, optional ?conversation_id= to stay in one chat,
+    ?cursor= (from next_cursor) and ?limit=.
+    """
+    q = request.GET.get('q', '').strip()
+    if len(q) < 2:
+        return JsonResponse({'results': [], 'next_cursor': None})
+
+    conversation_id = request.GET.get('conversation_id')
+    if conversation_id:
+        try:
+            conversation_id = uuid.UUID(conversation_id)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid conversation_id'}, status=400)
+    else:
+        conversation_id = None
+
+    limit = parse_limit(request, 20, 50)
+    try:
+        hits, next_cursor = search.search_messages(
+            request.user.id, q,
+            conversation_id=conversation_id,
+            cursor=request.GET.get('cursor'),
+            limit=limit,
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    except search.SearchUnavailable:
+        return JsonResponse({'error': 'Message search is unavailable'}, status=503)
+
+    results = [{
+        'id': str(m.id),
+        'conversation_id': str(m.conversation_id),
+        'sender_id': m.sender.id,
+        'sender_name': m.sender.get_full_name() or m.sender.username,
+        'snippet': snippet,
+        'timestamp': m.timestamp.isoformat(),
+    } for m, snippet in hits]
+
+    return JsonResponse({'results': results, 'next_cursor': next_cursor})
+
+
+@require_GET
+@login_required
+def presence_status(request):
+    """
+    Online / away / offline for up to 200 users.
+    Query param: ?user_ids=1,2,3
+    """
+    try:
+        user_ids = [int(uid) for uid in request.GET.get('user_ids', '').split(',') if uid.strip()]
+    except ValueError:
+        return JsonResponse({'error': 'user_ids must be a comma-separated list of ids'}, status=400)
+    if len(user_ids) > 200:
+        return JsonResponse({'error': 'At most 200 user_ids'}, status=400)
+
+    statuses = presence.statuses(user_ids)
+    return JsonResponse({'presence': {str(uid): status for uid, status in statuses.items()}})
+
+
 @require_GET
 @login_required
 def user_search(request):
@@ -1017,6 +1302,8 @@ def delete_event(request, event_id):
 
 @require_GET
 @login_required
+@conditional('events', sources=(Event.objects.filter(is_active=True),))
+@cached_response('events')
 def api_events_list(request):
     """Return all active events as JSON."""
     events_qs = Event.objects.filter(is_active=True)
@@ -1071,6 +1358,8 @@ def delete_announcement(request, announcement_id):
 
 @require_GET
 @login_required
+@conditional('announcements', sources=(Announcement.objects.filter(is_active=True),))
+@cached_response('announcements')
 def api_announcements_list(request):
     """Return all active announcements as JSON."""
     anns = Announcement.objects.filter(is_active=True)
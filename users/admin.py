@@ -114,7 +114,7 @@ class ConversationParticipantInline(admin.TabularInline):
 
 @admin.register(Conversation)
 class ConversationAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'is_group', 'created_at')
+    list_display = ('id', 'name', 'is_group', 'last_message_at', 'created_at')
     list_filter = ('is_group',)
     search_fields = ('name',)
     inlines = [ConversationParticipantInline]